@@ -1,11 +1,28 @@
-from flask import Flask, request, render_template, session, jsonify
-import numpy as np
-import pandas as pd
-import requests
+from flask import Flask, request, render_template, session, jsonify, Response, stream_with_context, redirect, url_for, g
 import json
-import joblib
-import re
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import numpy as np
+from forest_engine import CompiledForest
+from gemini_client import GeminiClient, GeminiError
+from resilience import DEGRADED_CHAT_MESSAGE, CircuitOpenError, resilient_from_env
+from session_store import session_interface_from_env
+from conversation_context import Conversation
+from drift import drift_monitor_from_env
+from job_queue import QueueFull, job_queue_from_env
+from llm_governor import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, GovernorBusy, governor_from_env
+from llm_cache import (CACHES, cache_from_env, cache_stats, canonical_amount, canonical_label, canonical_months,
+                       normalize_prompt, profile_key)
+from metrics import REGISTRY as metrics
+from peers import peer_index_from_env
+from profiler import profiler_from_env
+from loan_data import FEATURE_LABELS, LOAN_STATUS_CODES, columns, encode_applicant, encode_applicants
+from single_flight import single_flight_from_env
+from static_assets import StaticAssets
+from structured_output import parse_llm_json, parse_stats
+from what_if import what_if
 
 
 app = Flask(__name__)
@@ -13,19 +30,185 @@ app = Flask(__name__)
 # Set the secret key safely
 app.secret_key = os.getenv('SECRET_KEY')
 
+# Keep session data (chat history, LLM responses) server-side; the cookie only carries a session id
+app.session_interface = session_interface_from_env()
+
 # Set the API key safely
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
+
+# Shared, pooled Gemini client (endpoint, timeouts and retries are configured through GEMINI_* env vars)
+gemini_client = GeminiClient.from_env()
+
+# Caps concurrent (and optionally per-second) Gemini calls per worker and sheds excess load with 503s
+llm_governor = governor_from_env()
+
+# Hedged requests and a circuit breaker on top of the client; routes fall back to cached or canned answers.
+# Hedges only go out when the governor has a spare slot
+resilient_gemini = resilient_from_env(gemini_client, governor=llm_governor)
+
+# Bounded pool for running Gemini calls alongside request work (threads start on first use, after fork)
+llm_executor = ThreadPoolExecutor(max_workers=int(os.getenv('LLM_THREADS', 8)), thread_name_prefix='llm')
+
+# Background pool for the slow advice generations, so form posts can return at once (see /jobs)
+advice_jobs = job_queue_from_env()
+
+# Concurrent identical Gemini requests share one upstream call (see single_flight.py)
+llm_flight = single_flight_from_env()
+
+# Writes sampled stacks of requests slower than PROFILE_SLOW_REQUESTS seconds, for flame graphs
+slow_request_profiler = profiler_from_env()
+
+# Fingerprinted, precompressed static files with year-long caching, once `python scripts/build_static.py` has run
+static_assets = StaticAssets(app)
  
-# Load the predictive model from a file
-loaded_model = joblib.load('random_forest_model.pkl')
-print("Model loaded successfully.")
+# Predictive model files. The compiled artifact (built with `python forest_engine.py --save ...`, or a
+# models/<version> directory written by scripts/train_model.py) is memory-mapped so all gunicorn
+# workers share one copy; the pickle is the fallback.
+MODEL_PATH = os.getenv('MODEL_PATH', 'random_forest_model.pkl')
+COMPILED_MODEL_PATH = os.getenv('COMPILED_MODEL_PATH', 'random_forest_model.npy')
+
+_compiled_model = None
+_model_lock = threading.Lock()
+
+
+def get_compiled_model():
+    """
+    Returns the inference engine, loading it on first use.
+
+    The model is not loaded at import time so the app starts quickly; under gunicorn,
+    gunicorn.conf.py calls this once in the master before workers are forked.
+    """
+    global _compiled_model
+    if _compiled_model is None:
+        with _model_lock:
+            if _compiled_model is None:
+                if os.path.isdir(COMPILED_MODEL_PATH):
+                    engine = CompiledForest.load(COMPILED_MODEL_PATH)
+                    # Trained artifacts record their feature order; refuse one that does not match the form encoding
+                    feature_order = engine.metadata.get("feature_order", columns)
+                    if list(feature_order) != columns:
+                        raise ValueError(f"{COMPILED_MODEL_PATH} expects features {feature_order}, not {columns}")
+                else:
+                    import joblib
+                    # Flatten the forest into NumPy node arrays (bit-identical to the sklearn model)
+                    engine = CompiledForest.from_sklearn(joblib.load(MODEL_PATH))
+                # Per-leaf feature attributions, so explaining a decision is a table lookup
+                engine.prepare_contributions(len(columns))
+                _compiled_model = engine
+                print("Model loaded successfully.")
+    return _compiled_model
+
+
+_peer_index = None
+_peer_index_built = False
+_peer_lock = threading.Lock()
+
+
+def get_peer_index():
+    """
+    Returns the nearest-neighbour index over data.csv (see peers.py), building it on first use,
+    or None when the data is not available.
+    """
+    global _peer_index, _peer_index_built
+    if not _peer_index_built:
+        with _peer_lock:
+            if not _peer_index_built:
+                try:
+                    _peer_index = peer_index_from_env()
+                except Exception as e:
+                    print("[Peers Error]:", e)
+                _peer_index_built = True
+    return _peer_index
+
+
+_drift_monitor = None
+_drift_monitor_built = False
+_drift_lock = threading.Lock()
+
+
+def get_drift_monitor():
+    """
+    Returns the input drift monitor (see drift.py), building its reference histograms from
+    data.csv on first use, or None when the reference data is not available.
+    """
+    global _drift_monitor, _drift_monitor_built
+    if not _drift_monitor_built:
+        with _drift_lock:
+            if not _drift_monitor_built:
+                try:
+                    _drift_monitor = drift_monitor_from_env(metrics)
+                except Exception as e:
+                    print("[Drift Error]:", e)
+                _drift_monitor_built = True
+    return _drift_monitor
+
+
+if os.getenv('PRELOAD_MODEL') == '1':
+    get_compiled_model()
+    get_peer_index()
+    get_drift_monitor()
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.profile_token = slow_request_profiler.start() if slow_request_profiler else None
+
+
+@app.after_request
+def record_request_metrics(response):
+    """
+    Counts the request and times it until the response is closed, so streamed replies are
+    timed to their last byte.
+    """
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    method, status = request.method, str(response.status_code)
+    token = g.pop('profile_token', None)
+
+    def finish():
+        metrics.observe('investiq_http_request_duration_seconds', time.perf_counter() - started, {"route": route})
+        metrics.inc('investiq_http_requests_total', {"route": route, "method": method, "status": status})
+        if token is not None:
+            slow_request_profiler.stop(token, f"{method} {route}")
+
+    response.call_on_close(finish)
+    return response
+
+
+def collect_app_metrics(registry):
+    """
+    Copies the counters the caches, parser, governor, breaker and job queue already keep into the metrics registry.
+    """
+    for name, stats in cache_stats().items():
+        for event in ('hits', 'disk_hits', 'misses', 'evictions'):
+            registry.set_counter('investiq_llm_cache_events_total', {"cache": name, "event": event}, stats.get(event, 0))
+    for route, outcomes in parse_stats().items():
+        for outcome, count in outcomes.items():
+            registry.set_counter('investiq_llm_parse_total', {"route": route, "outcome": outcome}, count)
+
+    governor = llm_governor.stats()
+    for event in ('admitted', 'queued', 'rejected', 'shed', 'timeouts'):
+        registry.set_counter('investiq_gemini_governor_total', {"event": event}, governor[event])
+    registry.set_gauge('investiq_gemini_in_flight', None, governor["active"])
+    registry.set_gauge('investiq_gemini_queued', None, governor["queued_now"])
+
+    resilience = resilient_gemini.stats()
+    registry.set_gauge('investiq_gemini_breaker_open', None, int(resilience["breaker"]["state"] != "closed"))
+    for event in ('hedged', 'hedge_wins'):
+        registry.set_counter('investiq_gemini_hedges_total', {"event": event}, resilience[event])
+
+    flight = llm_flight.stats()
+    for event in ('leaders', 'coalesced'):
+        registry.set_counter('investiq_single_flight_total', {"event": event}, flight[event])
+    jobs = advice_jobs.stats()
+    for outcome in ('submitted', 'done', 'failed', 'rejected'):
+        registry.set_counter('investiq_jobs_total', {"outcome": outcome}, jobs[outcome])
+
+
+metrics.add_collector(collect_app_metrics)
 
-# Define the column names for the model input
-columns = [
-    'no_of_dependents', 'education', 'self_employed', 'income_annum',
-    'loan_amount', 'loan_term', 'cibil_score', 'residential_assets_value',
-    'commercial_assets_value', 'luxury_assets_value', 'bank_asset_value'
-]
 
 @app.route('/next_session', methods=["GET", "POST"])
 def next_session():
@@ -59,63 +242,200 @@ def get_gemini_response():
     if not user_message:
         return jsonify({"error": "No prompt provided."}), 400
 
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-    headers = {
-        'Content-Type': 'application/json'
-    }
-    payload = {
-        "contents": [{"parts": [{"text": user_message}]}]
-    }
+    if wants_stream():
+        return stream_chat_response(user_message)
 
     try:
-        response = requests.post(url, json=payload, headers=headers, params={"key": GEMINI_API_KEY})
-        if response.status_code == 200:
-            response_json = response.json()
-
-            if 'candidates' in response_json and len(response_json['candidates']) > 0:
-                bot_response = response_json['candidates'][0]['content']['parts'][0]['text']
-                return jsonify({"response": bot_response})
-            else:
-                return jsonify({"response": "Sorry, I couldn't understand that."})
-        else:
-            return jsonify({"error": f"Error from Gemini API: {response.status_code}"}), 500
-    except requests.exceptions.RequestException as e:
+        with llm_governor.slot(PRIORITY_NORMAL):
+            bot_response = resilient_gemini.generate_content(user_message)
+    except CircuitOpenError:
+        return jsonify({"response": DEGRADED_CHAT_MESSAGE, "degraded": True})
+    except GeminiError as e:
+        if e.status_code == 200:
+            return jsonify({"response": "Sorry, I couldn't understand that."})
+        if e.status_code:
+            return jsonify({"error": f"Error from Gemini API: {e.status_code}"}), 500
         return jsonify({"error": f"Error making the request: {str(e)}"}), 500
 
+    return jsonify({"response": bot_response})
 
 
 
 
-def gemini_generate_content(prompt):
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent"
-    headers = {'Content-Type': 'application/json'}
-    payload = {"contents": [{"parts": [{"text": prompt}]}]}
 
-    try:
-        response = requests.post(url, json=payload, headers=headers, params={"key": GEMINI_API_KEY})
-        if response.status_code != 200:
-            return f"Error: Gemini API returned status code {response.status_code}. Message: {response.text}"
-        response_json = response.json()
-        candidates = response_json.get("candidates", [])
-        if not candidates:
-            return "Error: No candidates returned."
-        content = candidates[0].get("content", {})
-        return content.get("parts", [{}])[0].get("text", "").strip()
-    except requests.exceptions.RequestException as e:
-        return f"Error: Request to Gemini API failed. Details: {str(e)}"
+def gemini_generate_content(prompt, json_mode=False, priority=PRIORITY_NORMAL):
+    def generate():
+        try:
+            with llm_governor.slot(priority):
+                return resilient_gemini.generate_content(prompt, json_mode=json_mode)
+        except GeminiError as e:
+            return f"Error: {str(e)}"
+
+    # Callers sending the same prompt at the same time wait for one upstream call
+    return llm_flight.do(f"gemini:{int(json_mode)}:{normalize_prompt(prompt)}", generate)
+
+
+
+
+def wants_stream():
+    """
+    Returns True when the client asked for a streamed (server-sent events) reply,
+    either with ?stream=1 or an `Accept: text/event-stream` header.
+    """
+    return request.args.get('stream') == '1' or 'text/event-stream' in request.headers.get('Accept', '')
+
+
+def sse_event(data, event=None):
+    """
+    Formats one server-sent event carrying a JSON payload.
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
 
+def stream_chat_response(prompt, on_complete=None, priority=PRIORITY_NORMAL):
+    """
+    Streams a Gemini reply to the browser as server-sent events.
+
+    Each generated chunk is sent as a `data: {"text": ...}` event as soon as it arrives,
+    followed by an `event: done` carrying the full reply (or `event: error`).
 
+    Args:
+    prompt (str): The prompt to send.
+    on_complete (callable): Optional callback receiving the full reply text once streaming ends.
+    priority (int): Governor priority; the slot is held until the stream ends.
 
-def get_response(prompt):
+    Returns:
+    Response: A text/event-stream response, or a JSON error if the upstream request fails.
+    """
+    permit = llm_governor.acquire(priority)
+    try:
+        chunks = resilient_gemini.stream_generate_content(prompt)
+    except CircuitOpenError:
+        permit.release()
+        # Degraded mode: answer with the canned message, which is not added to the chat history
+        return Response(sse_event({"text": DEGRADED_CHAT_MESSAGE}) +
+                        sse_event({"response": DEGRADED_CHAT_MESSAGE, "degraded": True}, event='done'),
+                        mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    except GeminiError as e:
+        permit.release()
+        return jsonify({"error": f"Error from Gemini API: {str(e)}"}), 500
+
+    def generate():
+        parts = []
+        try:
+            for text in chunks:
+                parts.append(text)
+                yield sse_event({"text": text})
+        except GeminiError as e:
+            yield sse_event({"error": str(e)}, event='error')
+            return
+        finally:
+            # Ends the upstream stream (and records its outcome) if the client went away mid-reply
+            chunks.close()
+            permit.release()
+
+        full_response = "".join(parts).strip()
+        if on_complete is not None:
+            on_complete(full_response)
+            # The session was saved when the headers went out; store what the callback added
+            app.session_interface.persist(session)
+        yield sse_event({"response": full_response}, event='done')
+
+    # X-Accel-Buffering stops nginx-style proxies from holding back the chunks
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also frees the slot if the client goes away before the stream starts
+    response.call_on_close(permit.release)
+    return response
+
+
+def get_response(prompt, json_mode=False, priority=PRIORITY_NORMAL):
     """
     Generates a chat response using Gemini API.
     """
-    return gemini_generate_content(prompt)
+    return gemini_generate_content(prompt, json_mode=json_mode, priority=priority)
 
-import re
 
-def get_predict_message(country):
+@app.errorhandler(GovernorBusy)
+def governor_busy(e):
+    """
+    Fails fast when Gemini capacity is exhausted, telling the client when to retry.
+    """
+    response = jsonify({"error": f"{e} Please try again in a few seconds."})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+
+# Expected shapes of the structured answers (see structured_output.validate)
+LINK_SCHEMA = {"type": "object", "properties": {"organizationName": {"type": "string"}, "link": {"type": "string"}}}
+PREDICT_SCHEMA = {
+    "type": "array", "wrap_object": True, "minItems": 1,
+    "items": {"type": "object", "properties": {"myCountry": LINK_SCHEMA, "otherCountry": LINK_SCHEMA}},
+}
+BUSINESS_SCHEMA = {
+    "type": "array", "wrap_object": True, "minItems": 1,
+    "items": {"type": "object", "required": ["Business_Idea"],
+              "properties": {"Business_Idea": {"type": "string"}, "sector": {"type": "string"},
+                             "link": {"type": "string"}}},
+}
+FINANCE_SCHEMA = {
+    "type": "object", "required": ["financial_breakdown"],
+    "properties": {"financial_breakdown": {"type": "string"}, "link": {"type": "string"}},
+}
+
+# Every valid structured answer is also kept here, long after it expires from its own cache,
+# as the degraded-mode fallback while Gemini is unavailable. It is sized by LAST_GOOD_CACHE_TTL and
+# LAST_GOOD_CACHE_SIZE, so tuning the primary caches down does not shrink the fallback
+last_good_cache = cache_from_env('last_known_good', ttl=90 * 24 * 3600, maxsize=1024, prefix='LAST_GOOD_CACHE')
+
+
+def last_known_good(cache, cache_key):
+    """
+    Returns the last valid answer stored for `cache_key` in `cache`, or [] if there is none.
+    """
+    return last_good_cache.get(f"{cache.name}:{cache_key}", [])
+
+
+def get_structured_answer(prompt, schema, name, cache, cache_key):
+    """
+    Gets a JSON answer from Gemini, parses and validates it, and caches it when valid.
+
+    Concurrent requests for the same answer (e.g. a burst of users from one country) are
+    coalesced into one Gemini call whose parsed result they all share. With SINGLE_FLIGHT_DIR
+    and LLM_CACHE_DB set, this also holds across gunicorn workers.
+
+    Args:
+    prompt (str): The prompt to send.
+    schema (dict): The expected answer shape (see structured_output.validate).
+    name (str): Route name for the parse counters.
+    cache (ResponseCache): Where valid answers are stored.
+    cache_key (str): The answer's key in `cache`.
+
+    Returns:
+    The parsed answer. When Gemini fails (or the breaker is open) or the answer cannot be used,
+    the last known good answer for the same key, or [] if there is none.
+    """
+    def fetch():
+        # Structured answers start a flow (form submit, chat_predict), so they go first
+        raw_response = get_response(prompt, json_mode=True, priority=PRIORITY_HIGH)
+        if raw_response.startswith("Error:"):
+            print("[Gemini Error]:", raw_response)
+            return last_known_good(cache, cache_key)
+        parsed = parse_llm_json(raw_response, schema, name)
+        if not parsed:
+            return last_known_good(cache, cache_key)
+        cache.set(cache_key, parsed)
+        last_good_cache.set(f"{cache.name}:{cache_key}", parsed)
+        return parsed
+
+    return llm_flight.do(f"{cache.name}:{cache_key}", fetch, recheck=lambda: cache.get(cache_key))
+
+
+# Loan providers per country change rarely; cache them for a week
+loan_provider_cache = cache_from_env('loan_providers', ttl=7 * 24 * 3600)
+
+def predict_message_prompt(country):
     format = '''
     [
         {
@@ -123,36 +443,59 @@ def get_predict_message(country):
             "otherCountry": {"organizationName": "", "link": "", "Country": ""}
         }
     ]'''
-    prompt = f"Hi, my country is {country}. Kindly give me a list of places I can get a good loan for my small business. Reply only in this JSON format without explanation: {format} Ensure links are valid and use organization names."
-    raw_response = get_response(prompt)
-    cleaned = re.sub(r"^```json|^```|```$", "", raw_response.strip(), flags=re.MULTILINE).strip()
-    try:
-        parsed_json = json.loads(cleaned)
-        return prompt, parsed_json
-    except Exception as e:
-        print("[Gemini Parsing Error]:", e)
-        print("[Raw Cleaned Text]:", cleaned)
-        return prompt, []
+    return f"Hi, my country is {country}. Kindly give me a list of places I can get a good loan for my small business. Reply only in this JSON format without explanation: {format} Ensure links are valid and use organization names."
 
 
+def get_predict_message(country):
+    prompt = predict_message_prompt(country)
 
+    # The answer only depends on the country, so repeat requests are served from the cache
+    cache_key = normalize_prompt(prompt)
+    cached = loan_provider_cache.get(cache_key)
+    if cached is not None:
+        return prompt, cached
 
-def handle_form(form_type):
-    # Capture form data
-    domain_interest = request.form['domain_interest']
-    description = request.form['description'] if form_type == 'financial_advice' else None  # Only for financial_advice
-    country_interest = request.form['country_interest']
-    capital_loan = request.form['capital_loan']
-    amount = request.form['amount']
-    loan_pay_month = request.form['loan_pay_month']
+    return prompt, get_structured_answer(prompt, PREDICT_SCHEMA, 'predict', loan_provider_cache, cache_key)
 
-    # Retrieve country from session (this would be set when the user goes through the next session)
-    country = session.get("country", None)
 
-    # Check if the country exists in the session (important for financial_advice and business_idea)
-    if not country:
-        return None, "Error: Country not found in session."
+def get_predict_fallback(country):
+    """
+    Returns the last known good loan providers for `country` without calling Gemini.
+    """
+    prompt = predict_message_prompt(country)
+    return prompt, last_known_good(loan_provider_cache, normalize_prompt(prompt))
+
+
+
+
+def advice_form_fields(form_type):
+    """
+    Reads the business idea / financial advice form, plus the user's country from the session.
+
+    Returns:
+    dict: The keyword arguments for `generate_advice` ("country" is None if it is not in the session).
+    """
+    return {
+        "domain_interest": request.form['domain_interest'],
+        "description": request.form['description'] if form_type == 'financial_advice' else None,  # Only for financial_advice
+        "country_interest": request.form['country_interest'],
+        "capital_loan": request.form['capital_loan'],
+        "amount": request.form['amount'],
+        "loan_pay_month": request.form['loan_pay_month'],
+        # Retrieve country from session (this would be set when the user goes through the next session)
+        "country": session.get("country", None),
+    }
+
+
+def generate_advice(form_type, country, domain_interest, description, country_interest, capital_loan, amount,
+                    loan_pay_month):
+    """
+    Gets the financial advice or business ideas for the form inputs. Needs no request
+    context, so it can also run as a background job.
 
+    Returns:
+    tuple: The prompt and the parsed response ([] if there is none).
+    """
     # Generate the appropriate prompt and response based on the form_type
     if form_type == 'financial_advice':
         bot_prompt, bot_response = get_financial_advice(
@@ -182,6 +525,65 @@ def handle_form(form_type):
     return bot_prompt, bot_response
 
 
+def handle_form(form_type):
+    # Capture form data
+    fields = advice_form_fields(form_type)
+
+    # Check if the country exists in the session (important for financial_advice and business_idea)
+    if not fields["country"]:
+        return None, "Error: Country not found in session."
+
+    return generate_advice(form_type, **fields)
+
+
+def wants_async():
+    """
+    Returns True when the client asked for the submit-then-poll mode, with an "async=1"
+    query or form field or a `Prefer: respond-async` header.
+    """
+    return ('1' in (request.args.get('async'), request.form.get('async'))
+            or 'respond-async' in request.headers.get('Prefer', ''))
+
+
+def submit_advice_job(form_type):
+    """
+    Queues the advice generation and returns at once, instead of holding the request
+    (and a worker) for the whole Gemini call.
+
+    Returns:
+    Response: 202 with the job id and its URLs for JSON clients, otherwise a redirect
+    to the result page, which waits for the job.
+    """
+    fields = advice_form_fields(form_type)
+    if not fields["country"]:
+        return jsonify({"error": "Error: Country not found in session."}), 400
+
+    try:
+        job_id = advice_jobs.submit(form_type, session.sid, generate_advice, form_type, **fields)
+    except QueueFull as e:
+        response = jsonify({"error": f"{e} Please try again in a few seconds."})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    result_url = url_for('job_result', job_id=job_id)
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({"job_id": job_id, "status_url": url_for('job_status', job_id=job_id),
+                        "result_url": result_url}), 202
+    return redirect(result_url, code=303)
+
+
+def render_advice(form_type, bot_prompt, bot_response):
+    """
+    Starts the follow-up chat with the advice and renders its page.
+    """
+    if form_type == 'financial_advice':
+        session["finance_conversation"] = Conversation.start(bot_prompt, bot_response).to_dict()
+        return render_template('chat_finance.html', bot_finance_response=bot_response)
+
+    session["business_conversation"] = Conversation.start(bot_prompt, bot_response).to_dict()
+    return render_template('chat_business.html', bot_business_response=bot_response)
+
+
 
 
 
@@ -191,6 +593,9 @@ def financial_advice():
     Route to handle financial advice requests based on user inputs.
     """
     if request.method == "POST":
+        if wants_async():
+            return submit_advice_job('financial_advice')
+
         # Call the helper function with 'financial_advice'
         bot_finance_prompt, bot_finance_response = handle_form('financial_advice')
         if isinstance(bot_finance_response, str) and bot_finance_response.startswith("Error"):
@@ -207,12 +612,8 @@ def financial_advice():
         else:
             return jsonify({"error": "No response received from Gemini API."}), 500
 
-        # Store response in session
-        session["bot_finance_response"] = bot_finance_response
-        session["bot_finance_prompt"] = bot_finance_prompt
-
-        # Render the page with the response
-        return render_template('chat_finance.html', bot_finance_response=bot_finance_response)
+        # Store response in session and render the page with the response
+        return render_advice('financial_advice', bot_finance_prompt, bot_finance_response)
 
     return render_template('form_financial_advice.html')
 
@@ -224,42 +625,49 @@ def financial_advice():
 
 
 
-def get_further_response(prediction, question, prev_prompt, prev_response):
+def get_further_response(prediction, question, conversation):
     """
     Generates a new prompt based on a previous conversation and a prediction result, then gets a response to it.
 
-    This function constructs a new prompt by appending additional context based on the prediction result to 
-    the previous conversation. The conversation is capped at 2500 characters for conciseness. The new prompt 
-    is then used to get a further response.
+    See `build_further_prompt` for how the prompt is constructed and for the arguments.
+
+    Returns:
+    tuple: A tuple containing the new prompt and the response from get_response function
+    (DEGRADED_CHAT_MESSAGE if Gemini failed).
+    """
+    new_prompt = build_further_prompt(prediction, question, conversation)
+
+    # Generate the response for the new prompt
+    further_response = get_response(new_prompt, priority=PRIORITY_LOW)
+    if further_response.startswith("Error:"):
+        print("[Gemini Error]:", further_response)
+        further_response = DEGRADED_CHAT_MESSAGE
+
+    return new_prompt, further_response
+
+
+def build_further_prompt(prediction, question, conversation):
+    """
+    Builds the follow-up prompt from a previous conversation and a prediction result.
+
+    The previous conversation is assembled by `Conversation.context`: the most recent turns
+    that fit in the CHAT_CONTEXT_TOKENS budget, preceded by a rolling summary of older turns.
 
     Args:
     prediction (int): The prediction result (0 for 'Yes', 1 for 'No', others for neutral).
     question (str): The new question to be asked.
-    prev_prompt (str): The previous prompt in the conversation.
-    prev_response (str): The previous response in the conversation.
+    conversation (Conversation): The chat history so far.
 
     Returns:
-    tuple: A tuple containing the new prompt and the response from get_response function.
+    str: The new prompt.
     """
-
-    # Combine previous prompt and response
-    old = str(prev_prompt) + str(prev_response)
-    previous_conv = ""
-    rev_old = old[::-1]
-
-    # Extract the last 2500 characters of the reversed conversation
-    for char in rev_old:
-        if len(previous_conv) < 2500:
-            previous_conv += char  # Fixed missing assignment operation
-
-    # Reverse the extracted conversation back to original order
-    final_previous_conv = previous_conv[::-1]
+    final_previous_conv = conversation.context()
 
     # Append additional text based on prediction
     if prediction == 0:  # Yes
-        add_text = "again congrats on your approved loan"
+        add_text = " again congrats on your approved loan"
     elif prediction == 1:  # No
-        add_text = 'again sorry about the unapproved loan'
+        add_text = ' again sorry about the unapproved loan'
     else:
         add_text = ""
 
@@ -268,10 +676,38 @@ def get_further_response(prediction, question, prev_prompt, prev_response):
     # Construct the new prompt
     new_prompt = "Question: " + question + " | Previous Context: " + final_previous_conv + " | Instruction: Provide a concise, direct answer within 800 characters."
 
-    # Generate the response for the new prompt
-    further_response = get_response(new_prompt)
+    return new_prompt
 
-    return new_prompt, further_response
+
+def further_chat(kind, prediction=""):
+    """
+    Answers a follow-up question for one of the chats ('predict', 'business' or 'finance').
+
+    The chat history lives in the session under "<kind>_conversation". The question and answer
+    are appended as a new turn; with a streaming request the turn is stored once the stream ends.
+
+    Returns:
+    Response: The streamed reply, or the JSON {"response": ...} for regular requests.
+    """
+    question = request.form['question']
+    conversation = Conversation.from_dict(session.get(f"{kind}_conversation"))
+
+    def remember(answer):
+        conversation.add_turn(question, answer)
+        session[f"{kind}_conversation"] = conversation.to_dict()
+
+    if wants_stream():
+        return stream_chat_response(build_further_prompt(prediction, question, conversation), on_complete=remember,
+                                    priority=PRIORITY_LOW)
+
+    # Get further response based on the new question and previous context
+    _, response = get_further_response(prediction=prediction, question=question, conversation=conversation)
+    if response == DEGRADED_CHAT_MESSAGE:
+        return jsonify({"response": response, "degraded": True})
+    remember(response)
+
+    # Return the new response in JSON format
+    return jsonify({"response": response})
 
 
 
@@ -282,6 +718,9 @@ def business_idea():
     Route to handle business idea suggestions based on user inputs.
     """
     if request.method == "POST":
+        if wants_async():
+            return submit_advice_job('business_idea')
+
         # Safely call the form handler
         result = handle_form('business_idea')
 
@@ -295,8 +734,8 @@ def business_idea():
         if not bot_business_response:
             return jsonify({"error": "No response received."}), 500
 
-        # Render the response in the frontend
-        return render_template('chat_business.html', bot_business_response=bot_business_response)
+        # Keep the exchange as the start of the follow-up chat and render the response in the frontend
+        return render_advice('business_idea', bot_business_prompt, bot_business_response)
 
     # For GET request
     return render_template('form_business_idea.html')
@@ -305,10 +744,39 @@ def business_idea():
 
 
 
+# Parsed answers for common business/finance profiles, keyed on the canonicalized form inputs
+advice_cache = cache_from_env('advice', ttl=24 * 3600, maxsize=1024)
+
+# Bump when the business/finance prompt templates change, so older cached answers are not reused
+ADVICE_PROMPT_VERSION = 1
+
+
+def canonical_profile(country, country_interest, capital_loan, amount, domain_interest, loan_pay_month):
+    """
+    Normalizes and buckets the advice form inputs so near-identical requests share a cache entry
+    (e.g. 5000 and 5050 USD, or "Tech" and "tech ").
+
+    Returns:
+    dict: The canonical values. They only build the cache key; the prompt keeps the user's own
+    values, so a cache hit may return the answer to a profile within one bucket of theirs.
+    """
+    capital_loan = 'capital' if str(capital_loan).strip().lower() == 'capital' else 'loan'
+    return {
+        "country": canonical_label(country),
+        "country_interest": canonical_label(country_interest),
+        "capital_loan": capital_loan,
+        "amount": canonical_amount(amount),
+        "domain_interest": canonical_label(domain_interest),
+        # The repayment period only matters for loans
+        "loan_pay_month": canonical_months(loan_pay_month) if capital_loan == 'loan' else "",
+    }
+
+
 def get_business_idea(country, country_interest, capital_loan, amount, domain_interest, loan_pay_month):
     """
     Generates a prompt for business ideas based on user's financial situation and interests, and gets a response.
     """
+    profile = canonical_profile(country, country_interest, capital_loan, amount, domain_interest, loan_pay_month)
     format = '''
     [
         {
@@ -324,40 +792,19 @@ def get_business_idea(country, country_interest, capital_loan, amount, domain_in
     ]
     '''
 
-    if capital_loan == 'capital':
+    if profile["capital_loan"] == 'capital':
         prompt = f"Hi, I'm from {country}. Kindly help curate few nice business ideas, the domain sector of the business and like to learn more on the business, considering that I have a capital of {amount} US Dollars. My domain of business interest is {domain_interest} and the country where I want to have my business is {country_interest}. Give the answer strictly in this format: {format} Thanks."
     else:
         prompt = f"Hi, I'm from {country}. Kindly help curate few nice business ideas, the domain sector of the business and like to learn more on the business, considering that I got a loan of {amount} US Dollars and I am meant to pay back in {loan_pay_month} months time. My domain of business interest is {domain_interest} and the country where I want to have my business is {country_interest}. Give the answer strictly in this format: {format} Thanks."
 
-    
-    # 🔸 Get the response from Gemini
-    raw_response = get_response(prompt)
+    cache_key = profile_key('business_idea', ADVICE_PROMPT_VERSION, profile)
+    cached = advice_cache.get(cache_key)
+    if cached is not None:
+        return prompt, cached
 
-    # 🔹 Extract text
-    if isinstance(raw_response, dict):
-        try:
-            text = raw_response['candidates'][0]['content']['parts'][0]['text']
-        except Exception as e:
-            print("[Gemini JSON structure error]:", e)
-            return prompt, []
-    elif isinstance(raw_response, str):
-        text = raw_response
-    else:
-        print("[Unexpected response type]:", type(raw_response))
-        return prompt, []
-
-    # 🔹 Clean up triple backtick markdown
-    cleaned = re.sub(r"^```json|^```|```$", "", text.strip(), flags=re.MULTILINE).strip()
+    # 🔸 Get the response from Gemini, then extract, repair and validate the JSON answer
+    return prompt, get_structured_answer(prompt, BUSINESS_SCHEMA, 'business_idea', advice_cache, cache_key)
 
-    # 🔹 Parse JSON
-    try:
-        business_ideas = json.loads(cleaned)
-        return prompt, business_ideas
-    except json.JSONDecodeError as e:
-        print(f"[Business Idea JSON Parsing Error]: {e}")
-        print("Cleaned Text That Failed Parsing:", cleaned)
-        return prompt, []
-    
 
 
 
@@ -365,6 +812,7 @@ def get_financial_advice(country, country_interest, description, capital_loan, a
     """
     Generates a prompt for financial advice and gets a structured JSON response.
     """
+    profile = canonical_profile(country, country_interest, capital_loan, amount, domain_interest, loan_pay_month)
     format = '''
     {
         "financial_breakdown": "",
@@ -373,47 +821,70 @@ def get_financial_advice(country, country_interest, description, capital_loan, a
     '''
 
     # Construct prompt
-    if capital_loan == 'capital':
+    if profile["capital_loan"] == 'capital':
         prompt = f"Hi, I'm from {country}. Kindly help curate a comprehensive financial breakdown with link to read more on it, for how I would manage my business considering that I have a capital of {amount} US Dollars. My domain of business interest is {domain_interest}, the description is: {description}, and the country where I want to have my business is {country_interest}. Make your answer strictly in this format: {format}."
     else:
         prompt = f"Hi, I'm from {country}. Kindly help curate a comprehensive financial breakdown with link to read more on it, for how I would manage my business considering that I got a loan of {amount} US Dollars and I am meant to pay back in {loan_pay_month} months time. My domain of business interest is {domain_interest}, the description is: {description}, and the country where I want to have my business is {country_interest}. Make your answer strictly in this format: {format}."
 
-    # Call Gemini API
-    advice_response = get_response(prompt)
+    # The free-text description cannot be bucketed, so it is part of the key as written (whitespace aside)
+    cache_key = profile_key('financial_advice', ADVICE_PROMPT_VERSION, profile, " ".join(str(description or "").split()))
+    cached = advice_cache.get(cache_key)
+    if cached is not None:
+        return prompt, cached
 
-    # Check for error in response
-    if isinstance(advice_response, str) and advice_response.startswith("Error:"):
-        print("[Gemini Error]:", advice_response)
-        return prompt, []
+    # Call Gemini API, then extract, repair and validate the JSON answer
+    return prompt, get_structured_answer(prompt, FINANCE_SCHEMA, 'financial_advice', advice_cache, cache_key)
 
-    # Extract actual text
-    if isinstance(advice_response, dict):
-        try:
-            text = advice_response['candidates'][0]['content']['parts'][0]['text']
-        except Exception as e:
-            print("[Gemini Financial JSON structure error]:", e)
-            return prompt, []
-    else:
-        text = advice_response
 
-    # 🔶 Clean up any ```json markdown blocks
-    cleaned = re.sub(r"^```json|^```|```$", "", text.strip(), flags=re.MULTILINE).strip()
 
-    # 🔶 Try parsing JSON safely
-    try:
-        financial_data = json.loads(cleaned, strict=False)  # use strict=False to allow minor control chars
-        return prompt, financial_data
-    except json.JSONDecodeError as e:
-        print(f"[Financial Advice JSON Parsing Error]: {e}")
-        print("Cleaned Text That Failed Parsing:", cleaned)
-        return prompt, []
 
+def approval_contributions(model, X):
+    """
+    Explains decisions as per-feature contributions to the approval probability.
 
+    Args:
+    model (CompiledForest): The inference engine.
+    X (np.ndarray): Encoded applicants, one row each.
+
+    Returns:
+    tuple: The base approval probability (the forest average) and a (n_samples, len(columns))
+    array; a row's base plus its contributions is its approval probability.
+    """
+    bias, contributions = model.contributions(X)
+    approved = list(model.classes_).index(LOAN_STATUS_CODES['approved'])
+    bias, contributions = bias[approved], contributions[:, :, approved]
+    if model.aggregation == 'logistic':
+        # Gradient boosting contributions are in log-odds: move the base through the sigmoid and
+        # give every feature its share of the row's change in probability, so they still add up
+        base = 1.0 / (1.0 + np.exp(-bias))
+        total = contributions.sum(axis=1)
+        change = 1.0 / (1.0 + np.exp(-(bias + total))) - base
+        # With no net change, scale by the slope of the sigmoid at the base instead
+        factor = np.where(np.abs(total) > 1e-12, change / np.where(total == 0, 1.0, total), base * (1.0 - base))
+        bias, contributions = base, contributions * factor[:, None]
+    return float(bias), contributions
+
+
+def explain_decision(model, X):
+    """
+    Returns the contributions of one applicant as (label, percentage points) pairs, largest
+    effect first, for chat_predict.html.
+    """
+    _, contributions = approval_contributions(model, X)
+    ranked = sorted(zip(columns, contributions[0]), key=lambda item: -abs(item[1]))
+    return [(FEATURE_LABELS[col], round(float(value) * 100, 1)) for col, value in ranked if round(float(value) * 100, 1)]
+
+
+# Seconds chat_predict waits for the loan-provider lookup before falling back to the last known list
+PREDICT_MESSAGE_TIMEOUT = float(os.getenv('PREDICT_MESSAGE_TIMEOUT', 8))
 
 
 @app.route('/chat_predict', methods=["GET", "POST"])
 def chat_predict():
     if request.method == "POST":
+        name = session.get("name", "User")
+        country = session.get("country", "your country")
+
         depend = request.form['depend']
         education = request.form['education']
         employment = request.form['employment']
@@ -445,18 +916,41 @@ def chat_predict():
             'bank_asset_value': bank
         }
 
-        arr = pd.DataFrame([prediction_data])
-        pred = int(loaded_model.predict(arr)[0])
-
-        name = session.get("name", "User")
-        country = session.get("country", "your country")
+        model = get_compiled_model()
+        try:
+            applicant_row = encode_applicant(prediction_data)
+            with metrics.timer('investiq_model_inference_seconds', {"op": "predict"}):
+                pred = int(model.predict(applicant_row)[0])
+        except ValueError as e:
+            return jsonify({"error": f"Invalid applicant data: {str(e)}"}), 400
+
+        # The applicant is valid, so look up loan providers (which don't depend on the
+        # decision) while the explanation, drift sketch and peers are computed
+        predict_message_future = llm_executor.submit(get_predict_message, country)
+        with metrics.timer('investiq_model_inference_seconds', {"op": "explain"}):
+            contributions = explain_decision(model, applicant_row)
+        drift_monitor = get_drift_monitor()
+        if drift_monitor is not None:
+            drift_monitor.record(applicant_row)
+        peer_index = get_peer_index()
+        peers = None
+        if peer_index is not None:
+            with metrics.timer('investiq_model_inference_seconds', {"op": "peers"}):
+                peers = peer_index.compare(applicant_row[0])
 
         # ✅ FIXED: Directly get parsed response, no double json.loads
-        prompt, bot_predict_response = get_predict_message(country)
+        # The decision is ready; don't hold it back for a slow or overloaded LLM
+        try:
+            prompt, bot_predict_response = predict_message_future.result(timeout=PREDICT_MESSAGE_TIMEOUT)
+        except (FutureTimeout, GovernorBusy):
+            # Drop the lookup if it is still queued; one already running finishes in the
+            # background (bounded by the Gemini client timeouts) and fills the cache
+            predict_message_future.cancel()
+            prompt, bot_predict_response = get_predict_fallback(country)
 
         session["pred"] = pred
-        session["bot_predict_prompt"] = prompt
-        session["bot_predict_response"] = bot_predict_response
+        session["prediction_data"] = prediction_data
+        session["predict_conversation"] = Conversation.start(prompt, bot_predict_response).to_dict()
 
         return render_template(
             'chat_predict.html',
@@ -466,12 +960,161 @@ def chat_predict():
             purpose=loan_purpose,
             name=name,
             country=country,
-            bot_predict_response=bot_predict_response
+            bot_predict_response=bot_predict_response,
+            contributions=contributions,
+            peers=peers
         )
 
     return render_template('form_predict.html')
 
-model= None
+
+
+# Rows scored per predict_proba call in /predict_batch, keeps memory bounded for large portfolios
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 5000))
+
+
+def score_encoded(X):
+    """
+    Scores encoded applicants with one vectorized predict_proba call per chunk of BATCH_CHUNK_SIZE rows.
+
+    Args:
+    X (np.ndarray): Encoded applicants, one row each in `columns` order.
+
+    Returns:
+    list: One dict per applicant with the prediction (0 approved, 1 rejected), the approval
+    probability and each feature's contribution to it (see approval_contributions).
+    """
+    model = get_compiled_model()
+    approved = list(model.classes_).index(LOAN_STATUS_CODES['approved'])
+    drift_monitor = get_drift_monitor()
+    results = []
+    for start in range(0, len(X), BATCH_CHUNK_SIZE):
+        chunk = X[start:start + BATCH_CHUNK_SIZE]
+        with metrics.timer('investiq_model_inference_seconds', {"op": "batch"}):
+            proba = model.predict_proba(chunk)
+            preds = model.classes_[proba.argmax(axis=1)]
+            _, contributions = approval_contributions(model, chunk)
+        if drift_monitor is not None:
+            drift_monitor.record(chunk)
+        for offset, (pred, p, contribution) in enumerate(zip(preds, proba[:, approved], contributions.round(6).tolist())):
+            results.append({"index": start + offset, "pred": int(pred), "approval_probability": round(float(p), 6),
+                            "contributions": dict(zip(columns, contribution))})
+    return results
+
+
+def score_applicants(frame):
+    """
+    Scores a DataFrame of applicants in the `columns` schema, see score_encoded.
+    """
+    return score_encoded(encode_applicants(frame).to_numpy())
+
+
+def encode_csv_upload(stream):
+    """
+    Reads and validates a whole CSV upload chunk by chunk before anything is scored, so a
+    bad value on any row gets a 400 instead of a truncated 200. Only the encoded float32
+    rows are kept (44 bytes per applicant), not the parsed text.
+
+    Returns:
+    list: The encoded chunks, each a (rows, len(columns)) array.
+
+    Raises:
+    ValueError: For values that are not numbers, or are NaN or infinite.
+    KeyError: For missing columns.
+    """
+    import pandas as pd
+
+    model = get_compiled_model()
+    return [model.check_input(encode_applicants(chunk).to_numpy())
+            for chunk in pd.read_csv(stream, chunksize=BATCH_CHUNK_SIZE, skipinitialspace=True)]
+
+
+def stream_scored_csv(chunks):
+    """
+    Scores the chunks read by encode_csv_upload and yields the results as CSV text.
+    """
+    yield ",".join(["index", "pred", "approval_probability"] + [f"{col}_contribution" for col in columns]) + "\n"
+    offset = 0
+    for chunk in chunks:
+        for row in score_encoded(chunk):
+            fields = [row['index'] + offset, row['pred'], row['approval_probability']]
+            fields.extend(row['contributions'][col] for col in columns)
+            yield ",".join(map(str, fields)) + "\n"
+        offset += len(chunk)
+
+
+@app.route('/predict_batch', methods=["POST"])
+def predict_batch():
+    """
+    Route to score many applicants in one request.
+
+    Accepts either a JSON body (a list of applicant objects, or {"applicants": [...]}) in the
+    `columns` schema, or a CSV upload (raw body with a text/csv content type, or a multipart
+    'file' field) with a header row. JSON requests get a JSON response, CSV requests get CSV back.
+
+    Returns:
+    Response: The prediction, approval probability and feature contributions for every
+    applicant, in input order.
+    """
+    import pandas as pd
+
+    upload = request.files.get('file')
+    if upload is not None or request.mimetype == 'text/csv':
+        stream = upload.stream if upload is not None else request.stream
+        try:
+            # Validate every row before the 200 starts; only the scoring is streamed
+            chunks = encode_csv_upload(stream)
+        except (ValueError, KeyError, pd.errors.ParserError) as e:
+            return jsonify({"error": f"Invalid CSV input: {str(e)}"}), 400
+
+        return Response(stream_with_context(stream_scored_csv(chunks)), mimetype='text/csv')
+
+    data = request.get_json(silent=True)
+    applicants = data.get('applicants') if isinstance(data, dict) else data
+    if not isinstance(applicants, list) or not applicants:
+        return jsonify({"error": "Provide a non-empty list of applicants."}), 400
+
+    try:
+        results = score_applicants(pd.DataFrame(applicants))
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid applicant data: {str(e)}"}), 400
+
+    return jsonify({"count": len(results), "results": results})
+
+
+@app.route('/what_if', methods=["POST"])
+def what_if_route():
+    """
+    Route answering "what would get me approved?" for a rejected applicant.
+
+    Accepts the applicant's `prediction_data` as JSON, either directly or as
+    {"applicant": {...}, "sweep": [...], "limit": 5}; without an applicant it uses the last
+    application scored in chat_predict. The CIBIL score, loan amount, loan term and asset
+    values are swept over grids (or only the ones named in "sweep"), and the whole grid is
+    scored in one batched model call.
+
+    Returns:
+    Response: JSON with the current decision and the smallest changes that flip it.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    applicant = data.get('applicant', data if 'cibil_score' in data else None) or session.get("prediction_data")
+    if not applicant:
+        return jsonify({"error": "Provide the applicant's prediction data."}), 400
+
+    model = get_compiled_model()
+    started = time.perf_counter()
+    try:
+        with metrics.timer('investiq_model_inference_seconds', {"op": "what_if"}):
+            result = what_if(model, encode_applicant(applicant)[0], sweeps=data.get('sweep'),
+                             limit=min(int(data.get('limit', 5)), 20))
+    except (ValueError, KeyError, TypeError) as e:
+        return jsonify({"error": f"Invalid what-if request: {str(e)}"}), 400
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return jsonify(result)
+
 
 @app.route('/', methods=["GET", "POST"])
 def main():
@@ -577,29 +1220,12 @@ def further_predict_chat():
     Returns:
     jsonify: A JSON response containing the prediction response for the user's question.
     """
-    ...
-    predict_response = ""  # Add this at the top to avoid reference error
-    ...
-
-    # Retrieve previous prediction and conversation context from session
-    pred = session.get("pred", None)
-    bot_predict_prompt = session.get("bot_predict_prompt", None)
-    bot_predict_response = session.get("bot_predict_response", None)
 
     # Process new question and get further response if method is POST
     if request.method == 'POST':
-        predict_question = request.form['question']
+        return further_chat('predict', prediction=session.get("pred", None))
 
-        # Get further response based on the new question and previous context
-        predict_prompt, predict_response = get_further_response(prediction=pred, question=predict_question,
-                                                                prev_prompt=bot_predict_prompt, prev_response=bot_predict_response)
-
-        # Update session with new response and prompt
-        session["bot_predict_response"] = predict_response
-        session["bot_predict_prompt"] = predict_question
-
-    # Return the new response in JSON format
-    return jsonify({"response": predict_response })
+    return jsonify({"response": ""})
 
 
 @app.route('/further_business_chat', methods=["GET", "POST"])
@@ -615,25 +1241,11 @@ def further_business_chat():
     jsonify: A JSON response containing the further response for the user's business-related question.
     """
 
-    # Retrieve previous business chat response and prompt from session
-    bot_business_response = session.get("bot_business_response", None)
-    bot_business_prompt = session.get("bot_business_prompt", None)
-
     # Process new question and get further response if method is POST
     if request.method == 'POST':
-        business_question = request.form['question']
+        return further_chat('business')
 
-        # Get further response based on the new question and previous context
-        business_prompt, business_response = get_further_response(prediction="", question=business_question,
-                                                                  prev_prompt=bot_business_prompt, prev_response=bot_business_response)
-
-        # Update session with new response and prompt
-        session["bot_business_response"] = business_response
-        session["bot_business_prompt"] = business_question
-
-    # Return the new response in JSON format
-    return jsonify({"response": business_response })
-       
+    return jsonify({"response": ""})
 
 
 @app.route('/further_finance_chat', methods=["GET", "POST"])
@@ -650,24 +1262,128 @@ def further_finance_chat():
     jsonify: A JSON response containing the further response for the user's finance-related question.
     """
 
-    # Retrieve previous financial advice response and prompt from session
-    bot_finance_response = session.get("bot_finance_response", None)
-    bot_finance_prompt = session.get("bot_finance_prompt", None)
-
     # Process new question and get further response if method is POST
     if request.method == 'POST':
-        finance_question = request.form['question']
+        return further_chat('finance')
 
-        # Get further response based on the new question and previous context
-        finance_prompt, finance_response = get_further_response(prediction="", question=finance_question,
-                                                                prev_prompt=bot_finance_prompt, prev_response=bot_finance_response)
+    return jsonify({"response": ""})
 
-        # Update session with new response and prompt
-        session["bot_finance_response"] = finance_response
-        session["bot_finance_prompt"] = finance_question
 
-    # Return the new response in JSON format
-    return jsonify({"response": finance_response })
+
+@app.route('/cache_stats')
+def cache_stats_route():
+    """
+    Route exposing the hit/miss counters of the LLM response caches, and how many
+    Gemini calls were coalesced, as JSON.
+    """
+    return jsonify(dict(cache_stats(), single_flight=llm_flight.stats()))
+
+
+@app.route('/parse_stats')
+def parse_stats_route():
+    """
+    Route exposing how often structured LLM answers parsed cleanly, needed repair, or failed.
+    """
+    return jsonify(parse_stats())
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Route reporting a background advice job: its status and, once done, the parsed result.
+    Jobs are only visible to the session that submitted them.
+    """
+    record = advice_jobs.get(job_id, owner=session.sid)
+    if record is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+
+    status = {"job_id": job_id, "kind": record["kind"], "status": record["status"]}
+    if record["status"] == "done":
+        status["result"] = record["result"][1]
+    elif record["status"] == "failed":
+        status["error"] = record["error"]
+    return jsonify(status)
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """
+    Route to display the result of a background advice job. While the job runs it shows a
+    waiting page that polls /jobs/<job_id> and reloads once the job has finished.
+    """
+    record = advice_jobs.get(job_id, owner=session.sid)
+    if record is None:
+        return jsonify({"error": "Unknown or expired job."}), 404
+    if record["status"] == "failed":
+        return jsonify({"error": record["error"]}), 500
+    if record["status"] != "done":
+        return render_template('job_wait.html', status_url=url_for('job_status', job_id=job_id))
+
+    bot_prompt, bot_response = record["result"]
+    if not bot_response:
+        return jsonify({"error": "No response received from Gemini API."}), 500
+    return render_advice(record["kind"], bot_prompt, bot_response)
+
+
+@app.route('/job_stats')
+def job_stats_route():
+    """
+    Route exposing the background job counters (submitted, done, failed, pending) as JSON.
+    """
+    return jsonify(advice_jobs.stats())
+
+
+@app.route('/governor_stats')
+def governor_stats_route():
+    """
+    Route exposing the Gemini governor's load, queue depth and queue wait times, and the
+    hedging and circuit breaker state, as JSON.
+    """
+    return jsonify(dict(llm_governor.stats(), resilience=resilient_gemini.stats()))
+
+
+@app.route('/metrics')
+def metrics_route():
+    """
+    Route exposing request, Gemini, model inference, session and cache metrics in the
+    Prometheus text format, merged across all gunicorn workers.
+    """
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/drift')
+def drift_route():
+    """
+    Route comparing the applicants scored by /chat_predict and /predict_batch, across all
+    workers, with the training data: PSI and KS per feature. `?refresh=1` recomputes the
+    comparison instead of returning the one from the last periodic check.
+    """
+    drift_monitor = get_drift_monitor()
+    if drift_monitor is None:
+        return jsonify({"error": "Drift monitoring is not available."}), 503
+    return jsonify(drift_monitor.report(refresh=request.args.get('refresh') == '1'))
+
+
+@app.route('/cache_invalidate', methods=["POST"])
+def cache_invalidate():
+    """
+    Route to drop cached LLM answers, e.g. after changing a prompt.
+
+    Expects the ADMIN_TOKEN environment value in the X-Admin-Token header. The optional
+    "cache" form/JSON field limits the flush to one cache; otherwise all caches are cleared.
+    """
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token or request.headers.get('X-Admin-Token') != admin_token:
+        return jsonify({"error": "Forbidden."}), 403
+
+    data = request.get_json(silent=True) or request.form
+    name = data.get('cache')
+    if name and name not in CACHES:
+        return jsonify({"error": f"Unknown cache: {name}"}), 404
+
+    for cache_name in ([name] if name else list(CACHES)):
+        CACHES[cache_name].invalidate()
+    return jsonify({"invalidated": [name] if name else list(CACHES)})
 
 
 
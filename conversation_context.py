@@ -0,0 +1,123 @@
+import json
+import os
+import re
+from collections import deque
+
+
+# Number of recent turns kept verbatim per chat
+MAX_TURNS = int(os.getenv('CHAT_MAX_TURNS', 8))
+
+# Token budget for the "Previous Context" part of a follow-up prompt
+CONTEXT_TOKENS = int(os.getenv('CHAT_CONTEXT_TOKENS', 700))
+
+# Upper bound on the rolling summary of turns that fell out of the window
+SUMMARY_MAX_CHARS = int(os.getenv('CHAT_SUMMARY_MAX_CHARS', 600))
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+
+def estimate_tokens(text):
+    """
+    Cheap token estimate (about 4 characters per token for English text).
+    """
+    return len(text) // 4 + 1
+
+
+def first_sentence(text, max_chars):
+    """
+    Returns the first sentence of `text`, cut to `max_chars`.
+    """
+    text = " ".join(str(text).split())
+    match = _SENTENCE_END.search(text, 0, max_chars + 1)
+    sentence = text[:match.start()] if match else text[:max_chars]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars - 1] + "…"
+
+
+def as_text(value):
+    """
+    Converts a stored prompt or response (which may be parsed JSON) into prompt text.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+class Conversation:
+    """
+    Bounded chat history for one conversation.
+
+    The newest MAX_TURNS turns are kept verbatim in a ring. A turn pushed out of the
+    ring is folded into a short extractive summary (first sentence of the question
+    and of the answer), which itself is capped at SUMMARY_MAX_CHARS. Conversations
+    are stored in the session as plain dicts (see `to_dict` / `from_dict`).
+    """
+
+    def __init__(self, turns=(), summary=(), max_turns=MAX_TURNS):
+        self.turns = deque((tuple(t) for t in turns), maxlen=max_turns)
+        self.summary = list(summary)
+
+    @classmethod
+    def start(cls, prompt, response):
+        """
+        Starts a conversation from the initial form prompt and the LLM answer to it.
+        """
+        conversation = cls()
+        conversation.add_turn(as_text(prompt), as_text(response))
+        return conversation
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(turns=data.get("turns", ()), summary=data.get("summary", ()))
+
+    def to_dict(self):
+        return {"turns": [list(t) for t in self.turns], "summary": self.summary}
+
+    def add_turn(self, question, answer):
+        """
+        Appends a turn, folding the oldest turn into the summary when the ring is full.
+        """
+        if len(self.turns) == self.turns.maxlen:
+            self._fold(self.turns[0])
+        self.turns.append((as_text(question), as_text(answer)))
+
+    def _fold(self, turn):
+        question, answer = turn
+        self.summary.append(f"Asked: {first_sentence(question, 120)} Answered: {first_sentence(answer, 160)}")
+        total = sum(len(item) for item in self.summary)
+        while total > SUMMARY_MAX_CHARS and len(self.summary) > 1:
+            total -= len(self.summary.pop(0))
+
+    def context(self, budget_tokens=CONTEXT_TOKENS):
+        """
+        Assembles the previous-conversation text within a token budget.
+
+        The summary of older turns is reserved first, then turns are taken newest first
+        until the budget is spent (the turn that crosses it is truncated to its most
+        recent part). Runs in time linear in the size of the kept history.
+
+        Returns:
+        str: The context, oldest material first.
+        """
+        budget = budget_tokens * 4  # in characters, matching estimate_tokens
+        summary = "Earlier: " + " ".join(self.summary) if self.summary else ""
+        if len(summary) > budget // 2:
+            summary = ""
+        budget -= len(summary)
+
+        pieces = []
+        for question, answer in reversed(self.turns):
+            piece = f"User: {question} InvestIQ: {answer}"
+            if len(piece) > budget:
+                if budget > 40:
+                    pieces.append("…" + piece[-(budget - 1):])
+                break
+            pieces.append(piece)
+            budget -= len(piece) + 4
+
+        if summary:
+            pieces.append(summary)
+        return " || ".join(reversed(pieces))
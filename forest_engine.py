@@ -0,0 +1,387 @@
+import json
+import os
+
+import numpy as np
+
+
+# Arrays written by CompiledForest.save, one .npy file each so they can be memory-mapped
+ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'children', 'value', 'roots', 'classes')
+
+
+class CompiledForest:
+    """
+    Array-based inference engine for a fitted sklearn RandomForestClassifier.
+
+    Every tree of the forest is flattened into one set of contiguous node arrays
+    (split feature, threshold, left/right child, normalized leaf values). Prediction
+    walks all trees for all rows at once, one vectorized step per tree level, which
+    avoids the DataFrame handling, input validation and per-tree Python dispatch of
+    `RandomForestClassifier.predict`.
+
+    Results are bit-identical to the sklearn model: inputs are cast to float32 like
+    sklearn's tree code, leaf values are normalized the same way and tree outputs are
+    summed in the same (sequential) order before averaging.
+
+    A binary GradientBoostingClassifier can be compiled too (`from_sklearn_gbdt`); its
+    trees hold raw scores, which are summed with `aggregation='logistic'` instead of
+    averaged.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes, children=None,
+                 metadata=None, aggregation='mean', init=0.0, scale=1.0, n_features=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+
+        # Interleaved [left, right] pairs so one take() picks the next node
+        if children is None:
+            children = np.ascontiguousarray(np.column_stack([left, right]).ravel())
+        self.children = children
+
+        # Free-form description of the artifact (e.g. feature order, training metrics), see `save`
+        self.metadata = metadata or {}
+
+        # How tree outputs are combined: 'mean' of class distributions (random forest) or
+        # 'logistic', sigmoid(init + scale * sum of raw scores) (binary gradient boosting)
+        self.aggregation = aggregation
+        self.init = float(init)
+        self.scale = float(scale)
+
+        # Width of the rows the model was trained on; None for artifacts saved without it
+        self.n_features = int(n_features) if n_features is not None else None
+
+    @staticmethod
+    def _flatten(trees, max_depth=None, normalize=True):
+        """
+        Concatenates sklearn tree structures into node arrays.
+
+        With `max_depth`, nodes at that depth become leaves (their class distribution is
+        the one of all training samples that reached them) and deeper nodes are dropped.
+        """
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        depth_reached = 0
+        for tree in trees:
+            children_left, children_right = tree.children_left, tree.children_right
+            feature, threshold, value = tree.feature, tree.threshold, tree.value[:, 0, :]
+            if max_depth is not None and tree.max_depth > max_depth:
+                depth = np.zeros(tree.node_count, dtype=np.intp)
+                for node in range(tree.node_count):  # parents always precede their children
+                    if children_left[node] != -1:
+                        depth[children_left[node]] = depth[children_right[node]] = depth[node] + 1
+                keep = depth <= max_depth
+                new_index = np.cumsum(keep) - 1
+                cut = keep & (depth == max_depth)
+                children_left = np.where(cut, -1, np.where(children_left == -1, -1, new_index[children_left]))[keep]
+                children_right = np.where(cut, -1, np.where(children_right == -1, -1, new_index[children_right]))[keep]
+                feature, threshold, value = feature[keep], threshold[keep], value[keep]
+                tree_depth = max_depth
+            else:
+                tree_depth = tree.max_depth
+
+            n = len(children_left)
+            is_leaf = children_left == -1
+            node_ids = np.arange(n) + offset
+
+            # Leaves point back to themselves so extra traversal steps are no-ops
+            features.append(np.where(is_leaf, 0, feature))
+            thresholds.append(np.where(is_leaf, np.inf, threshold))
+            lefts.append(np.where(is_leaf, node_ids, children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, children_right + offset))
+
+            value = value.astype(np.float64)
+            if normalize:
+                # Same normalization as DecisionTreeClassifier.predict_proba
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+
+            roots.append(offset)
+            depth_reached = max(depth_reached, tree_depth)
+            offset += n
+
+        return dict(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values)),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=depth_reached,
+        )
+
+    @classmethod
+    def from_sklearn(cls, model, n_trees=None, max_depth=None):
+        """
+        Builds the engine from a fitted RandomForestClassifier.
+
+        Args:
+        model (RandomForestClassifier): The fitted forest (e.g. loaded from random_forest_model.pkl).
+        n_trees (int): Keep only the first `n_trees` trees (a smaller, approximate forest).
+        max_depth (int): Cut every tree at this depth (a shallower, approximate forest).
+
+        Returns:
+        CompiledForest: The flattened forest.
+        """
+        estimators = model.estimators_[:n_trees] if n_trees else model.estimators_
+        arrays = cls._flatten([estimator.tree_ for estimator in estimators], max_depth=max_depth)
+        return cls(classes=np.asarray(model.classes_), n_features=model.n_features_in_, **arrays)
+
+    @classmethod
+    def from_sklearn_gbdt(cls, model):
+        """
+        Builds the engine from a fitted binary GradientBoostingClassifier.
+        """
+        if len(model.classes_) != 2:
+            raise ValueError("Only binary gradient boosting models can be compiled")
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        arrays = cls._flatten(trees, normalize=False)
+        # The initial raw score is what decision_function adds on top of the trees
+        probe = np.zeros((1, model.n_features_in_))
+        tree_sum = sum(tree.predict(probe.astype(np.float32))[0, 0] for tree in trees)
+        init = float(model.decision_function(probe)[0]) - model.learning_rate * tree_sum
+        return cls(classes=np.asarray(model.classes_), aggregation='logistic', init=init,
+                   scale=model.learning_rate, n_features=model.n_features_in_, **arrays)
+
+    def quantized(self):
+        """
+        Returns a copy with float32 thresholds and leaf values and int32 node indices,
+        roughly halving the memory of the node arrays. Predictions are approximate.
+        """
+        return CompiledForest(
+            feature=self.feature.astype(np.int32), threshold=self.threshold.astype(np.float32),
+            left=self.left.astype(np.int32), right=self.right.astype(np.int32),
+            value=self.value.astype(np.float32), roots=self.roots.astype(np.int32),
+            max_depth=self.max_depth, classes=self.classes_, metadata=self.metadata,
+            aggregation=self.aggregation, init=self.init, scale=self.scale, n_features=self.n_features)
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by the node arrays, in bytes.
+        """
+        return sum(getattr(self, 'classes_' if name == 'classes' else name).nbytes for name in ARRAY_NAMES)
+
+    def save(self, path, metadata=None):
+        """
+        Writes the engine to a directory of .npy files plus a small metadata file.
+
+        Args:
+        path (str): Target directory, created if needed.
+        metadata (dict): Extra JSON-serializable information stored in meta.json and
+            returned as `metadata` by `load` (defaults to the engine's own `metadata`).
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(path, name + '.npy'), getattr(self, 'classes_' if name == 'classes' else name))
+        meta = dict(self.metadata if metadata is None else metadata,
+                    max_depth=self.max_depth, n_estimators=self.n_estimators,
+                    aggregation=self.aggregation, init=self.init, scale=self.scale, n_features=self.n_features)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads an engine written by `save`.
+
+        With mmap=True the node arrays are memory-mapped read-only, so every process that
+        loads the same artifact shares one copy of the forest through the page cache.
+
+        Args:
+        path (str): Directory written by `save`.
+        mmap (bool): Memory-map the arrays instead of reading them into private memory.
+
+        Returns:
+        CompiledForest: The loaded engine.
+        """
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, name + '.npy'), mmap_mode='r' if mmap else None)
+                  for name in ARRAY_NAMES}
+        return cls(max_depth=meta["max_depth"], metadata=meta, aggregation=meta.get("aggregation", 'mean'),
+                   init=meta.get("init", 0.0), scale=meta.get("scale", 1.0), n_features=meta.get("n_features"),
+                   **arrays)
+
+    @property
+    def n_estimators(self):
+        return len(self.roots)
+
+    def check_input(self, X):
+        """
+        Returns `X` as a 2-D float32 array, rejecting what sklearn's input validation would.
+
+        Raises:
+        ValueError: If a row has the wrong number of features, or a value is NaN or infinite
+            (missing JSON fields, "nan" or "inf" form values).
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.ndim != 2:
+            raise ValueError(f"Expected a 2-D array of applicants, got {X.ndim} dimensions")
+        if self.n_features is not None and X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, but the model expects {self.n_features}")
+        if self.n_features is None and X.shape[1] <= int(self.feature.max()):
+            raise ValueError(f"X has {X.shape[1]} features, but the model uses {int(self.feature.max()) + 1}")
+        if not np.isfinite(X).all():
+            raise ValueError("Input X contains NaN or infinity")
+        return X
+
+    def apply(self, X):
+        """
+        Returns the leaf reached in every tree for every row.
+
+        Args:
+        X (array-like): A (n_samples, n_features) array in the model's feature order.
+
+        Returns:
+        np.ndarray: A (n_samples, n_estimators) array of global node indices.
+
+        Raises:
+        ValueError: For malformed input, see `check_input`.
+        """
+        X = self.check_input(X)
+
+        n_samples, n_features = X.shape
+        flat_X = np.ascontiguousarray(X).ravel()
+        row_offsets = (np.arange(n_samples, dtype=np.intp) * n_features)[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], n_samples, axis=0)
+        for _ in range(self.max_depth):
+            x = flat_X.take(row_offsets + self.feature.take(nodes))
+            go_right = ~(x <= self.threshold.take(nodes))
+            nodes = self.children.take(2 * nodes + go_right)
+        return nodes
+
+    def predict_proba(self, X):
+        """
+        Predicts class probabilities, identical to RandomForestClassifier.predict_proba.
+        """
+        leaf_values = self.value[self.apply(X)]
+        if self.aggregation == 'logistic':
+            raw = self.init + self.scale * leaf_values[:, :, 0].sum(axis=1)
+            positive = 1.0 / (1.0 + np.exp(-raw))
+            return np.column_stack([1.0 - positive, positive])
+        # cumsum adds the trees strictly in order, matching sklearn's accumulation
+        proba = np.cumsum(leaf_values, axis=1)[:, -1, :]
+        proba /= self.n_estimators
+        return proba
+
+    def predict(self, X):
+        """
+        Predicts class labels, identical to RandomForestClassifier.predict.
+        """
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def prepare_contributions(self, n_features):
+        """
+        Precomputes the feature attribution of every leaf, so `contributions` only has to
+        look leaves up.
+
+        Following each root-to-leaf path, the change in node value at every split is
+        credited to the split's feature (tree path attribution, as in Saabas' treeinterpreter).
+        The result is a (n_leaves, n_features, n_outputs) table, about 640 KB for the
+        shipped forest.
+        """
+        n_nodes = len(self.feature)
+        node_ids = np.arange(n_nodes)
+        internal = self.left != node_ids
+        path = np.zeros((n_nodes, n_features, self.value.shape[1]))
+        frontier = np.asarray(self.roots, dtype=np.intp)
+        while frontier.size:
+            parents = frontier[internal[frontier]]
+            parent_features = self.feature[parents].astype(np.intp)
+            for children in (self.left[parents], self.right[parents]):
+                path[children] = path[parents]
+                path[children, parent_features] += self.value[children] - self.value[parents]
+            frontier = np.concatenate([self.left[parents], self.right[parents]]).astype(np.intp)
+
+        leaves = np.flatnonzero(~internal)
+        self._leaf_row = np.full(n_nodes, -1, dtype=np.intp)
+        self._leaf_row[leaves] = np.arange(len(leaves))
+        self._leaf_contributions = path[leaves]
+
+    def contributions(self, X):
+        """
+        Splits every prediction into a bias plus one contribution per feature.
+
+        For a random forest, `bias + contributions.sum(axis=1)` equals `predict_proba(X)`
+        (up to float rounding): the bias is the mean class distribution at the roots. For
+        gradient boosting the split is of the raw log-odds, with class 0 taking the negated
+        log-odds of class 1.
+
+        Returns:
+        tuple: The bias, shape (n_classes,), and the contributions, shape
+        (n_samples, n_features, n_classes).
+        """
+        X = self.check_input(X)
+        if getattr(self, '_leaf_contributions', None) is None:
+            self.prepare_contributions(X.shape[1])
+
+        rows = self._leaf_row[self.apply(X)]
+        total = np.zeros((len(X),) + self._leaf_contributions.shape[1:])
+        for tree in range(self.n_estimators):
+            total += self._leaf_contributions[rows[:, tree]]
+        root_values = self.value[self.roots].sum(axis=0)
+
+        if self.aggregation == 'logistic':
+            bias = self.init + self.scale * root_values[0]
+            total *= self.scale
+            return np.array([-bias, bias]), np.concatenate([-total, total], axis=2)
+        return root_values / self.n_estimators, total / self.n_estimators
+
+
+def check_parity(model, engine, X):
+    """
+    Compares the engine against the sklearn model on the given rows.
+
+    Args:
+    model (RandomForestClassifier): The reference sklearn model.
+    engine (CompiledForest): The compiled version of the same model.
+    X (pd.DataFrame): Encoded rows in the model's feature order.
+
+    Returns:
+    dict: The number of rows checked, the number of rows whose probabilities are not
+    bit-identical, and the number of differing predicted labels.
+    """
+    expected = model.predict_proba(X)
+    actual = engine.predict_proba(X.to_numpy())
+    return {
+        "rows": len(X),
+        "proba_mismatches": int(np.any(expected != actual, axis=1).sum()),
+        "label_mismatches": int((model.predict(X) != engine.predict(X.to_numpy())).sum()),
+    }
+
+
+if __name__ == '__main__':
+    # Parity check against the sklearn model on data.csv, optionally writing the compiled artifact:
+    #   python forest_engine.py --save random_forest_model.npy
+    import argparse
+    import sys
+    import joblib
+    from loan_data import load_dataset
+
+    parser = argparse.ArgumentParser(description="Compile random_forest_model.pkl and check parity with sklearn.")
+    parser.add_argument('--model', default='random_forest_model.pkl')
+    parser.add_argument('--data', default='data.csv')
+    parser.add_argument('--save', help="directory to write the memory-mappable artifact to")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    engine = CompiledForest.from_sklearn(model)
+    X, _ = load_dataset(args.data)
+    report = check_parity(model, engine, X)
+    print(report)
+    if report["proba_mismatches"] or report["label_mismatches"]:
+        sys.exit(1)
+
+    if args.save:
+        engine.save(args.save)
+        report = check_parity(model, CompiledForest.load(args.save), X)
+        print("Saved to", args.save, report)
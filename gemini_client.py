@@ -0,0 +1,192 @@
+import json
+import os
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import REGISTRY as metrics
+
+
+# Model endpoint, without the ":generateContent" method suffix. Point it at a local stub for tests.
+GEMINI_API_URL = os.getenv(
+    'GEMINI_API_URL', 'https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash')
+
+# Status codes worth retrying: quota exhaustion and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    """
+    Raised when the Gemini API cannot be reached or does not return a usable answer.
+    """
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class GeminiClient:
+    """
+    Shared HTTP client for the Gemini API.
+
+    Keeps a pooled keep-alive session so chat turns reuse TLS connections, applies
+    connect/read timeouts so a hung upstream cannot pin a worker, and retries 429/5xx
+    responses and connection errors a bounded number of times with jittered
+    exponential backoff (honouring Retry-After when the API sends it).
+    """
+
+    def __init__(self, api_key, base_url=GEMINI_API_URL, connect_timeout=5.0, read_timeout=60.0,
+                 max_retries=2, backoff_base=0.5, backoff_max=8.0, pool_size=10):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json'})
+
+    @classmethod
+    def from_env(cls):
+        """
+        Builds a client from GEMINI_* environment variables.
+        """
+        return cls(
+            api_key=os.getenv('GEMINI_API_KEY'),
+            base_url=os.getenv('GEMINI_API_URL', GEMINI_API_URL),
+            connect_timeout=float(os.getenv('GEMINI_CONNECT_TIMEOUT', 5)),
+            read_timeout=float(os.getenv('GEMINI_READ_TIMEOUT', 60)),
+            max_retries=int(os.getenv('GEMINI_MAX_RETRIES', 2)),
+            pool_size=int(os.getenv('GEMINI_POOL_SIZE', 10)),
+        )
+
+    def _backoff(self, attempt, response=None):
+        """
+        Returns how long to wait before the given retry attempt.
+        """
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # "Full jitter": spreads retries from many workers instead of synchronizing them
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def post(self, method, payload, **kwargs):
+        """
+        Sends a request to `<base_url>:<method>` with retries.
+
+        Args:
+        method (str): The API method, e.g. 'generateContent'.
+        payload (dict): The JSON request body.
+        **kwargs: Extra arguments for `requests.Session.post` (e.g. stream=True, params).
+
+        Returns:
+        requests.Response: The final response (which may still be an error status once retries run out).
+
+        Raises:
+        GeminiError: If the API could not be reached after all retries.
+        """
+        params = dict(kwargs.pop('params', {}), key=self.api_key)
+        url = f"{self.base_url}:{method}"
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                response = self.session.post(url, json=payload, params=params, timeout=self.timeout, **kwargs)
+            except requests.exceptions.RequestException as e:
+                self._observe(method, started, 'error')
+                if not isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                    raise GeminiError(f"Request to Gemini API failed. Details: {str(e)}")
+                if attempt == self.max_retries:
+                    raise GeminiError(f"Request to Gemini API failed. Details: {str(e)}")
+                time.sleep(self._backoff(attempt))
+                continue
+
+            self._observe(method, started, str(response.status_code))
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                response.close()
+                time.sleep(self._backoff(attempt, response))
+                continue
+            return response
+
+    @staticmethod
+    def _observe(method, started, status):
+        metrics.observe('investiq_gemini_request_duration_seconds', time.perf_counter() - started, {"method": method})
+        metrics.inc('investiq_gemini_requests_total', {"method": method, "status": status})
+
+    def generate_content(self, prompt, json_mode=False):
+        """
+        Sends a single-turn prompt to generateContent and returns the reply text.
+
+        Args:
+        prompt (str): The prompt to send.
+        json_mode (bool): Ask for a JSON reply (responseMimeType application/json), so the
+            answer comes back without markdown fences or prose around it.
+
+        Raises:
+        GeminiError: On transport errors, non-200 responses, malformed bodies, or replies without candidates.
+        """
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        if json_mode:
+            payload["generationConfig"] = {"responseMimeType": "application/json"}
+        response = self.post('generateContent', payload)
+        if response.status_code != 200:
+            raise GeminiError(
+                f"Gemini API returned status code {response.status_code}. Message: {response.text}",
+                status_code=response.status_code)
+
+        try:
+            candidates = response.json().get("candidates", [])
+        except ValueError as e:
+            # A 200 whose body is not JSON (e.g. cut off by a proxy); no status code, so it counts as an outage
+            raise GeminiError(f"Gemini API returned a malformed response. Details: {str(e)}")
+        if not candidates:
+            raise GeminiError("No candidates returned.", status_code=response.status_code)
+        content = candidates[0].get("content", {})
+        return content.get("parts", [{}])[0].get("text", "").strip()
+
+    def stream_generate_content(self, prompt):
+        """
+        Sends a single-turn prompt to streamGenerateContent (server-sent events) and
+        returns an iterator over the reply text as it is generated.
+
+        The request is made eagerly, so connection and status errors are raised here;
+        errors while reading the stream are raised from the iterator.
+
+        Raises:
+        GeminiError: On transport errors or non-200 responses.
+        """
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+        response = self.post('streamGenerateContent', payload, params={"alt": "sse"}, stream=True)
+        if response.status_code != 200:
+            message = response.text
+            response.close()
+            raise GeminiError(
+                f"Gemini API returned status code {response.status_code}. Message: {message}",
+                status_code=response.status_code)
+        return self._iter_stream_text(response)
+
+    @staticmethod
+    def _iter_stream_text(response):
+        response.encoding = 'utf-8'
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                candidates = json.loads(line[len('data:'):]).get("candidates", [])
+                if not candidates:
+                    continue
+                for part in candidates[0].get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        yield part["text"]
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise GeminiError(f"Streaming from Gemini API failed. Details: {str(e)}")
+        finally:
+            response.close()
@@ -0,0 +1,54 @@
+# Gunicorn settings, picked up automatically by `gunicorn app:app` (see Procfile)
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from serving import worker_plan_from_env
+
+# Workers are separate processes, so sessions and job results must live in a store they all share
+os.environ.setdefault('SESSION_STORE', 'sqlite')
+os.environ.setdefault('JOB_STORE', 'sqlite')
+
+# Each worker writes its metrics here and /metrics merges them; one directory per server (master pid)
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), f'investiq-metrics-{os.getpid()}'))
+
+# Threaded workers by default: a request waiting on Gemini holds a thread, not a whole process, so
+# pages and predictions stay fast while chats wait. Sized from the cores and EXPECTED_LLM_LATENCY
+# (see serving.py); WEB_CONCURRENCY, GUNICORN_THREADS or --workers/--threads override it.
+plan = worker_plan_from_env()
+worker_class = plan["worker_class"]
+workers = plan["workers"]
+threads = plan["threads"]
+
+# Every thread may be waiting on Gemini at once, so the per-worker connection pool, call limit and
+# helper pool grow with the thread count unless they are set explicitly
+os.environ.setdefault('GEMINI_POOL_SIZE', str(max(10, threads)))
+os.environ.setdefault('GEMINI_MAX_CONCURRENT', str(max(8, threads)))
+os.environ.setdefault('LLM_THREADS', str(max(8, threads)))
+
+# Import app.py once in the master process instead of once per worker
+preload_app = True
+
+
+def when_ready(server):
+    """
+    Loads the model, the peer index and the drift reference in the master before any
+    worker is forked, so workers share their memory copy-on-write (or through the page
+    cache when the compiled artifact is memory-mapped) instead of each loading a
+    private copy.
+    """
+    from app import get_compiled_model, get_drift_monitor, get_peer_index
+    get_compiled_model()
+    get_peer_index()
+    get_drift_monitor()
+    server.log.info("Serving with %s %s workers x %s threads", server.cfg.workers, server.cfg.worker_class_str,
+                    server.cfg.threads)
+
+
+def on_exit(server):
+    """
+    Removes the workers' metrics files.
+    """
+    shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
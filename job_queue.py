@@ -0,0 +1,107 @@
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from session_store import MemorySessionStore, SQLiteSessionStore
+
+
+class QueueFull(Exception):
+    """
+    Raised when too many jobs are already waiting.
+    """
+
+
+class JobQueue:
+    """
+    Runs slow work (e.g. a long Gemini generation) in a background thread pool so the
+    request that submits it can return a job id at once.
+
+    Job records live in a bounded store with expiry (the session store classes, keyed by
+    job id). With the SQLite store any worker can report on a job, so the status poll
+    does not have to reach the worker that runs it.
+
+    A record is a dict with "status" ('queued', 'running', 'done' or 'failed'), "kind",
+    "owner" (the session id that submitted it), "created_at", and once finished
+    "result" or "error".
+    """
+
+    def __init__(self, store, max_workers=4, max_pending=64):
+        self.store = store
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.counters = {"submitted": 0, "done": 0, "failed": 0, "rejected": 0}
+
+    def submit(self, kind, owner, fn, *args, **kwargs):
+        """
+        Queues `fn(*args, **kwargs)`; its return value becomes the job's "result".
+
+        Returns:
+        str: The job id.
+
+        Raises:
+        QueueFull: If `max_pending` jobs are already queued or running in this worker.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.counters["rejected"] += 1
+                raise QueueFull("Too many requests are being prepared right now.")
+            self._pending += 1
+            self.counters["submitted"] += 1
+
+        job_id = secrets.token_urlsafe(16)
+        record = {"status": "queued", "kind": kind, "owner": owner, "created_at": time.time()}
+        self.store.save(job_id, record)
+        self._executor.submit(self._run, job_id, record, fn, args, kwargs)
+        return job_id
+
+    def _run(self, job_id, record, fn, args, kwargs):
+        outcome = "failed"
+        try:
+            self.store.save(job_id, dict(record, status="running"))
+            result = fn(*args, **kwargs)
+            self.store.save(job_id, dict(record, status="done", result=result))
+            outcome = "done"
+        except Exception as e:
+            print("[Job Error]:", e)
+            self.store.save(job_id, dict(record, status="failed", error=str(e)))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.counters[outcome] += 1
+
+    def get(self, job_id, owner=None):
+        """
+        Returns the job record, or None if it is unknown, expired or (when `owner` is
+        given) belongs to someone else.
+        """
+        record = self.store.load(job_id)
+        if record is None or (owner is not None and record.get("owner") != owner):
+            return None
+        return record
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, pending=self._pending, max_pending=self.max_pending)
+
+
+def job_queue_from_env():
+    """
+    Builds the job queue from environment variables.
+
+    JOB_STORE selects where job records live: 'memory' (default, single process) or
+    'sqlite' (at JOB_DB, shared by all workers). JOB_TTL is how long finished results
+    are kept in seconds, JOB_MAX_ENTRIES caps the records kept, JOB_THREADS sizes the
+    pool and JOB_QUEUE_SIZE caps the jobs waiting per worker.
+    """
+    ttl = float(os.getenv('JOB_TTL', 3600))
+    max_entries = int(os.getenv('JOB_MAX_ENTRIES', 10000))
+    if os.getenv('JOB_STORE', 'memory') == 'sqlite':
+        store = SQLiteSessionStore(os.getenv('JOB_DB', 'jobs.sqlite3'), ttl=ttl, max_entries=max_entries)
+    else:
+        store = MemorySessionStore(ttl=ttl, max_entries=max_entries)
+    return JobQueue(store, max_workers=int(os.getenv('JOB_THREADS', 4)),
+                    max_pending=int(os.getenv('JOB_QUEUE_SIZE', 64)))
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# Every cache registers itself here so their counters can be reported together
+CACHES = {}
+
+
+def normalize_prompt(prompt):
+    """
+    Builds a cache key from a prompt: whitespace is collapsed and case is folded,
+    so prompts that differ only in formatting share one entry.
+    """
+    normalized = " ".join(str(prompt).split()).casefold()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def profile_key(*parts):
+    """
+    Builds a cache key from already-canonicalized profile values.
+    """
+    return normalize_prompt(json.dumps(parts, sort_keys=True))
+
+
+def canonical_label(text):
+    """
+    Normalizes a free-form label such as a business domain or a country:
+    surrounding whitespace and punctuation are dropped, inner whitespace is
+    collapsed and all-lowercase text is title-cased ("  tech " -> "Tech").
+    Keys built from labels are case-insensitive anyway (see `normalize_prompt`).
+    """
+    text = " ".join(str(text or "").split()).strip(" .,;:-")
+    return text.title() if text.islower() else text
+
+
+def canonical_amount(amount, step=1.1):
+    """
+    Buckets a money amount on a log scale, so amounts within roughly 10% of each
+    other share a bucket (5000 and 5050 both become "4,800").
+
+    The bucket is represented by a rounded value with two significant digits.
+    Amounts that cannot be parsed are returned as normalized text.
+    """
+    cleaned = re.sub(r"[^0-9.]", "", str(amount))
+    try:
+        value = float(cleaned)
+    except ValueError:
+        return canonical_label(amount)
+    if value <= 0:
+        return "0"
+    bucket = round(math.log(value, step))
+    representative = step ** bucket
+    digits = max(0, int(math.floor(math.log10(representative))) - 1)
+    return f"{int(round(representative, -digits)):,}"
+
+
+def canonical_months(months):
+    """
+    Buckets a repayment period: up to a year it is kept to the month, longer
+    periods are rounded to the nearest 6 months.
+    """
+    try:
+        value = max(1, int(round(float(str(months).strip()))))
+    except ValueError:
+        return canonical_label(months)
+    if value > 12:
+        value = int(round(value / 6.0)) * 6
+    return str(value)
+
+
+class ResponseCache:
+    """
+    Two-level cache for parsed LLM responses.
+
+    The first level is an in-process LRU with a TTL. The optional second level is a
+    SQLite file shared by every gunicorn worker on the machine, with the same TTL and
+    a cap on the number of rows (least recently used rows are evicted first). Values
+    must be JSON-serializable.
+    """
+
+    def __init__(self, name, maxsize=256, ttl=24 * 3600, db_path=None, db_max_entries=10000):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.db_path = db_path
+        self.db_max_entries = db_max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self.counters = {"hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0}
+
+        if db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS cache (namespace TEXT, key TEXT, value TEXT, "
+                    "expires_at REAL, accessed_at REAL, PRIMARY KEY (namespace, key))")
+                conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (namespace, accessed_at)")
+
+        CACHES[name] = self
+
+    def _connect(self):
+        # One connection per thread; WAL lets readers in other workers proceed during writes
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not cross a fork (e.g. gunicorn preload), so reconnect in a new process
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] += n
+
+    def get(self, key, default=None):
+        """
+        Returns the cached value for `key`, or `default` when it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return value
+                del self._entries[key]
+
+        if self.db_path:
+            try:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?",
+                    (self.name, key, now)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                                 (now, self.name, key))
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self._count("disk_hits")
+                    return value
+            except sqlite3.Error as e:
+                print("[Cache Error]:", e)
+
+        self._count("misses")
+        return default
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def set(self, key, value, ttl=None):
+        """
+        Stores `value` under `key` in memory and, when configured, on disk.
+        """
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._remember(key, value, expires_at)
+        self._count("sets")
+
+        if self.db_path:
+            try:
+                conn = self._connect()
+                conn.execute("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)",
+                             (self.name, key, json.dumps(value), expires_at, now))
+                with self._lock:
+                    self._writes += 1
+                    prune = self._writes % 100 == 1
+                if prune:
+                    self._prune(conn, now)
+            except sqlite3.Error as e:
+                print("[Cache Error]:", e)
+
+    def _prune(self, conn, now):
+        # Drop expired rows, then the least recently used rows beyond db_max_entries
+        conn.execute("DELETE FROM cache WHERE namespace = ? AND expires_at <= ?", (self.name, now))
+        removed = conn.execute(
+            "DELETE FROM cache WHERE namespace = ? AND key IN (SELECT key FROM cache WHERE namespace = ? "
+            "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.name, self.name, self.db_max_entries)).rowcount
+        if removed > 0:
+            self._count("evictions", removed)
+
+    def invalidate(self, key=None):
+        """
+        Removes one entry, or every entry of this cache when `key` is None.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+        if self.db_path:
+            try:
+                if key is None:
+                    self._connect().execute("DELETE FROM cache WHERE namespace = ?", (self.name,))
+                else:
+                    self._connect().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.name, key))
+            except sqlite3.Error as e:
+                print("[Cache Error]:", e)
+
+    def stats(self):
+        """
+        Returns the hit/miss counters and current size of the in-process level.
+        """
+        with self._lock:
+            stats = dict(self.counters, size=len(self._entries), maxsize=self.maxsize)
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def cache_from_env(name, ttl=24 * 3600, maxsize=256, prefix='LLM_CACHE'):
+    """
+    Builds a ResponseCache configured through LLM_CACHE_* environment variables.
+
+    LLM_CACHE_DB enables the shared SQLite level (unset keeps the cache in-process only),
+    <prefix>_TTL and <prefix>_SIZE (LLM_CACHE_TTL and LLM_CACHE_SIZE by default) override
+    the TTL in seconds and the in-process size, and LLM_CACHE_DB_MAX_ENTRIES caps the
+    rows kept per cache on disk.
+    """
+    return ResponseCache(
+        name,
+        maxsize=int(os.getenv(f'{prefix}_SIZE', maxsize)),
+        ttl=float(os.getenv(f'{prefix}_TTL', ttl)),
+        db_path=os.getenv('LLM_CACHE_DB') or None,
+        db_max_entries=int(os.getenv('LLM_CACHE_DB_MAX_ENTRIES', 10000)),
+    )
+
+
+def cache_stats():
+    """
+    Returns the counters of every registered cache, keyed by cache name.
+    """
+    return {name: cache.stats() for name, cache in CACHES.items()}
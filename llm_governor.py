@@ -0,0 +1,220 @@
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Request priorities, lower runs first
+PRIORITY_HIGH = 0     # first answers of a flow, e.g. the loan-provider lookup in chat_predict
+PRIORITY_NORMAL = 1   # the general chat
+PRIORITY_LOW = 2      # follow-up questions in the further_*_chat routes
+
+
+class GovernorBusy(Exception):
+    """
+    Raised when no Gemini capacity frees up in time. `retry_after` is a hint in seconds.
+    """
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Permit:
+    """
+    A held slot; `release` is idempotent so it can be called from several cleanup paths.
+    """
+
+    def __init__(self, governor):
+        self._governor = governor
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._governor._release(time.monotonic() - self._started)
+
+
+class LLMGovernor:
+    """
+    Admission control for outbound Gemini calls in one process.
+
+    At most `max_concurrent` calls run at once and, when `rate` is set, calls start no
+    faster than a token bucket of `rate` per second (bursts of up to `burst`). Callers
+    that cannot start immediately wait in a queue ordered by priority, then arrival.
+    The queue is bounded: when it is full, a new caller either displaces the
+    lowest-priority waiter (if it outranks it) or is rejected at once, and a waiter that
+    is not admitted within `max_wait` seconds gives up. Rejected callers get a
+    GovernorBusy, which the app turns into a 503 with Retry-After, so load is shed
+    instead of piling up in blocked workers.
+    """
+
+    def __init__(self, max_concurrent=8, rate=0.0, burst=None, max_queue=32, max_wait=10.0):
+        self.max_concurrent = max_concurrent
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiters = []  # heap of [priority, seq, shed]
+        self._seq = itertools.count()
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._hold_estimate = 2.0  # moving average of how long a call holds its slot
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "shed": 0, "timeouts": 0,
+                         "wait_seconds_total": 0.0, "wait_seconds_max": 0.0}
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _token_delay(self):
+        # Seconds until the bucket holds a whole token (0 when one is available or there is no bucket)
+        if self.rate <= 0 or self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def _admit(self, waited):
+        self._active += 1
+        if self.rate > 0:
+            self._tokens -= 1
+        self.counters["admitted"] += 1
+        self.counters["wait_seconds_total"] += waited
+        self.counters["wait_seconds_max"] = max(self.counters["wait_seconds_max"], waited)
+        return Permit(self)
+
+    def _release(self, held):
+        with self._cond:
+            self._active -= 1
+            self._hold_estimate = 0.8 * self._hold_estimate + 0.2 * held
+            self._cond.notify_all()
+
+    def retry_after(self):
+        """
+        Estimates when capacity is likely to be free again, in whole seconds.
+        """
+        backlog = self._hold_estimate * (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(max(backlog, self._token_delay())))
+
+    def _busy(self, counter, message):
+        self.counters[counter] += 1
+        return GovernorBusy(message, retry_after=self.retry_after())
+
+    def _remove(self, entry):
+        self._waiters.remove(entry)
+        heapq.heapify(self._waiters)
+
+    def acquire(self, priority=PRIORITY_NORMAL):
+        """
+        Waits for a slot.
+
+        Returns:
+        Permit: Must be released once the call (or stream) is finished.
+
+        Raises:
+        GovernorBusy: If the queue is full or no slot frees up within `max_wait`.
+        """
+        start = time.monotonic()
+        with self._cond:
+            self._refill(start)
+            if not self._waiters and self._active < self.max_concurrent and self._token_delay() == 0:
+                return self._admit(0.0)
+
+            if len(self._waiters) >= self.max_queue:
+                lowest = max(self._waiters, default=None)
+                if lowest is None or lowest[0] <= priority:
+                    raise self._busy("rejected", "Too many requests are waiting for the AI service.")
+                # Make room by shedding the least important waiter
+                lowest[2] = True
+                self._remove(lowest)
+                self._cond.notify_all()
+
+            entry = [priority, next(self._seq), False]
+            heapq.heappush(self._waiters, entry)
+            self.counters["queued"] += 1
+            deadline = start + self.max_wait
+            while True:
+                if entry[2]:
+                    raise self._busy("shed", "The AI service is busy with higher-priority requests.")
+                now = time.monotonic()
+                self._refill(now)
+                delay = self._token_delay()
+                if self._waiters[0] is entry and self._active < self.max_concurrent and delay == 0:
+                    heapq.heappop(self._waiters)
+                    # The next waiter may be able to start as well
+                    self._cond.notify_all()
+                    return self._admit(now - start)
+                if now >= deadline:
+                    self._remove(entry)
+                    self._cond.notify_all()
+                    raise self._busy("timeouts", "Timed out waiting for the AI service.")
+                self._cond.wait(min(deadline - now, delay) if delay else deadline - now)
+
+    def try_acquire(self):
+        """
+        Takes a slot only if one (and a token) is free right now and nobody is waiting.
+
+        For optional extra calls such as hedges, which should never queue or get ahead of
+        waiting callers.
+
+        Returns:
+        Permit: The slot, or None when the governor is at capacity.
+        """
+        with self._cond:
+            self._refill(time.monotonic())
+            if not self._waiters and self._active < self.max_concurrent and self._token_delay() == 0:
+                return self._admit(0.0)
+            return None
+
+    @contextmanager
+    def slot(self, priority=PRIORITY_NORMAL):
+        """
+        Holds a slot for the duration of a `with` block.
+        """
+        permit = self.acquire(priority)
+        try:
+            yield permit
+        finally:
+            permit.release()
+
+    def stats(self):
+        """
+        Returns the current load (running calls, queue depth per priority) and the
+        admission counters, including the average and maximum queue wait.
+        """
+        with self._cond:
+            stats = dict(self.counters, active=self._active, max_concurrent=self.max_concurrent,
+                         queued_now=len(self._waiters), max_queue=self.max_queue)
+            by_priority = {}
+            for priority, _, _ in self._waiters:
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+        stats["queued_by_priority"] = by_priority
+        stats["wait_seconds_avg"] = round(stats["wait_seconds_total"] / stats["admitted"], 4) if stats["admitted"] else 0.0
+        stats["wait_seconds_total"] = round(stats["wait_seconds_total"], 4)
+        stats["wait_seconds_max"] = round(stats["wait_seconds_max"], 4)
+        return stats
+
+
+def governor_from_env():
+    """
+    Builds the governor from environment variables. The limits apply per worker process.
+
+    GEMINI_MAX_CONCURRENT caps the calls in flight, GEMINI_RATE_LIMIT (calls per second,
+    0 disables it) and GEMINI_BURST configure the token bucket, and LLM_QUEUE_SIZE and
+    LLM_QUEUE_TIMEOUT bound how many callers wait and for how long.
+    """
+    burst = os.getenv('GEMINI_BURST')
+    return LLMGovernor(
+        max_concurrent=int(os.getenv('GEMINI_MAX_CONCURRENT', 8)),
+        rate=float(os.getenv('GEMINI_RATE_LIMIT', 0)),
+        burst=int(burst) if burst else None,
+        max_queue=int(os.getenv('LLM_QUEUE_SIZE', 32)),
+        max_wait=float(os.getenv('LLM_QUEUE_TIMEOUT', 10)),
+    )
@@ -0,0 +1,97 @@
+import numpy as np
+
+
+# Define the column names for the model input
+columns = [
+    'no_of_dependents', 'education', 'self_employed', 'income_annum',
+    'loan_amount', 'loan_term', 'cibil_score', 'residential_assets_value',
+    'commercial_assets_value', 'luxury_assets_value', 'bank_asset_value'
+]
+
+# Display names for the model columns, e.g. when explaining a decision
+FEATURE_LABELS = {
+    'no_of_dependents': 'Number of dependents', 'education': 'Education', 'self_employed': 'Self-employed',
+    'income_annum': 'Annual income', 'loan_amount': 'Loan amount', 'loan_term': 'Loan term',
+    'cibil_score': 'CIBIL score', 'residential_assets_value': 'Residential assets',
+    'commercial_assets_value': 'Commercial assets', 'luxury_assets_value': 'Luxury assets',
+    'bank_asset_value': 'Bank assets',
+}
+
+# Categorical codes used when the model was trained (see Prediction.ipynb, LabelEncoder)
+EDUCATION_CODES = {'graduate': 0, 'not graduate': 1}
+SELF_EMPLOYED_CODES = {'no': 0, 'yes': 1}
+LOAN_STATUS_CODES = {'approved': 0, 'rejected': 1}
+
+CATEGORICAL_CODES = {'education': EDUCATION_CODES, 'self_employed': SELF_EMPLOYED_CODES}
+
+
+def encode_value(col, value):
+    """
+    Converts one raw field value into the float the model expects.
+
+    Categorical columns accept either the encoded values used by the web form (0/1)
+    or the raw labels found in data.csv ('Graduate', 'Not Graduate', 'Yes', 'No').
+    """
+    codes = CATEGORICAL_CODES.get(col)
+    if codes is not None and isinstance(value, str):
+        label = value.strip().lower()
+        if label in codes:
+            return float(codes[label])
+    return float(value)
+
+
+def encode_applicant(record):
+    """
+    Converts a single applicant dict (e.g. the `prediction_data` built from the form) into a model row.
+
+    Args:
+    record (dict): Field values keyed by the model `columns`.
+
+    Returns:
+    np.ndarray: A (1, len(columns)) float array in `columns` order.
+    """
+    return np.array([[encode_value(col, record[col]) for col in columns]], dtype=np.float64)
+
+
+def encode_applicants(frame):
+    """
+    Converts a DataFrame of applicants into the numeric layout expected by the model.
+
+    Args:
+    frame (pd.DataFrame): Applicants with at least the model `columns`.
+
+    Returns:
+    pd.DataFrame: A float DataFrame with exactly the model `columns`, in order.
+    """
+    import pandas as pd
+
+    frame = frame.rename(columns=lambda c: str(c).strip())
+    missing = [c for c in columns if c not in frame.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    frame = frame[columns].copy()
+    for col, codes in CATEGORICAL_CODES.items():
+        labels = frame[col].astype(str).str.strip().str.lower()
+        frame[col] = labels.map(codes).fillna(frame[col])
+
+    return frame.apply(pd.to_numeric, errors='raise').astype(float)
+
+
+def load_dataset(path='data.csv'):
+    """
+    Loads the historical applications the model was trained on.
+
+    Args:
+    path (str): Location of the CSV file.
+
+    Returns:
+    tuple: The encoded feature DataFrame (model `columns`) and the loan_status labels (0 approved, 1 rejected).
+    """
+    import pandas as pd
+
+    data = pd.read_csv(path, skipinitialspace=True)
+    data.columns = data.columns.str.strip()
+    X = encode_applicants(data)
+    y = data['loan_status'].str.strip().str.lower().map(LOAN_STATUS_CODES).astype(int)
+    return X, y
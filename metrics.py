@@ -0,0 +1,273 @@
+import atexit
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Latency buckets in seconds, from sub-millisecond model calls to minute-long LLM generations
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _label_key(labels):
+    return tuple(sorted((str(k), str(v)) for k, v in (labels or {}).items()))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Metrics:
+    """
+    Counters, gauges and histograms for one process, rendered in the Prometheus text format.
+
+    Recording is a dict update under a lock. With a `directory`, every process writes its
+    values to `<directory>/<pid>.json` about every `flush_interval` seconds (from a
+    background thread started on first use, so after gunicorn forks), and `render`
+    merges the files of all workers: counters and histograms are summed, including
+    those of workers that have exited, while gauges only count live processes.
+
+    Collectors registered with `add_collector` are called before each flush or render to
+    copy counters that other modules already keep (cache hits, governor admissions, ...)
+    in with `set_counter` and `set_gauge`.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._meta = {}  # name -> (type, help, buckets)
+        self._counters = {}  # (name, labels) -> value
+        self._gauges = {}
+        self._histograms = {}  # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self._collectors = []
+        self._flusher_pid = None
+        self._flusher_lock = threading.Lock()
+
+    def describe(self, name, kind, help_text, buckets=None):
+        """
+        Declares a metric; `kind` is 'counter', 'gauge' or 'histogram'.
+        """
+        self._meta[name] = (kind, help_text, tuple(buckets or LATENCY_BUCKETS) if kind == 'histogram' else None)
+
+    def add_collector(self, collector):
+        """
+        Registers `collector(metrics)`, called before the values are flushed or rendered.
+        """
+        self._collectors.append(collector)
+
+    def _touch(self):
+        # The first recording in each process starts its flusher (the pid changes after a fork)
+        if not self.directory or self._flusher_pid == os.getpid():
+            return
+        # Concurrent first recordings in a threaded worker must start only one flusher
+        with self._flusher_lock:
+            if self._flusher_pid != os.getpid():
+                self._flusher_pid = os.getpid()
+                threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+                atexit.register(self.flush)
+
+    def inc(self, name, labels=None, value=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._touch()
+
+    def set_counter(self, name, labels, value):
+        """
+        Sets a counter to a total accumulated elsewhere in this process.
+        """
+        with self._lock:
+            self._counters[(name, _label_key(labels))] = value
+
+    def set_gauge(self, name, labels, value):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name, value, labels=None):
+        buckets = self._meta[name][2]
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[bisect.bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+        self._touch()
+
+    @contextmanager
+    def timer(self, name, labels=None):
+        """
+        Observes the duration of a `with` block in the histogram `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def _collect(self):
+        for collector in self._collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                print("[Metrics Error]:", e)
+
+    def snapshot(self):
+        """
+        Returns this process's values in the JSON layout of the per-process files.
+        """
+        self._collect()
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "counters": [[name, labels, value] for (name, labels), value in self._counters.items()],
+                "gauges": [[name, labels, value] for (name, labels), value in self._gauges.items()],
+                "histograms": [[name, labels, list(values)] for (name, labels), values in self._histograms.items()],
+            }
+
+    def flush(self):
+        if not self.directory:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.json")
+            with open(path + '.tmp', 'w') as f:
+                json.dump(self.snapshot(), f, separators=(',', ':'))
+            os.replace(path + '.tmp', path)
+        except (OSError, TypeError, ValueError) as e:
+            print("[Metrics Error]:", e)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def _snapshots(self):
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # being replaced, or removed by a restart
+        return snapshots
+
+    def merged(self):
+        """
+        Returns the values of all processes merged as `render` reports them.
+
+        Returns:
+        tuple: Counters, gauges and histograms, each keyed by (name, ((label, value), ...)).
+        """
+        counters, gauges, histograms = {}, {}, {}
+        for snap in self._snapshots():
+            alive = snap["pid"] == os.getpid() or _pid_alive(snap["pid"])
+            for name, labels, value in snap["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, value in snap["gauges"]:
+                if alive:
+                    key = (name, tuple(map(tuple, labels)))
+                    gauges[key] = gauges.get(key, 0) + value
+            for name, labels, values in snap["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.get(key)
+                histograms[key] = values if merged is None else [a + b for a, b in zip(merged, values)]
+        return counters, gauges, histograms
+
+    def render(self):
+        """
+        Returns the merged values of all processes in the Prometheus text exposition format.
+        """
+        counters, gauges, histograms = self.merged()
+        lines = []
+        for name in sorted(self._meta):
+            kind, help_text, buckets = self._meta[name]
+            series = {'counter': counters, 'gauge': gauges, 'histogram': histograms}[kind]
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key in keys:
+                labels = key[1]
+                if kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(series[key])}")
+                    continue
+                values = series[key]
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), values[:-1]):
+                    cumulative += count
+                    le = bound if bound == '+Inf' else _format_value(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(float(values[-1]))}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return '\n'.join(lines) + '\n'
+
+
+def metrics_from_env():
+    """
+    Builds the process-wide registry. METRICS_DIR enables the multi-process mode (set by
+    gunicorn.conf.py); METRICS_FLUSH_INTERVAL is how often each worker writes its values.
+    """
+    metrics = Metrics(directory=os.getenv('METRICS_DIR') or None,
+                      flush_interval=float(os.getenv('METRICS_FLUSH_INTERVAL', 1.0)))
+
+    metrics.describe('investiq_http_requests_total', 'counter', "HTTP requests by route, method and status.")
+    metrics.describe('investiq_http_request_duration_seconds', 'histogram',
+                     "Time to serve a request, until the last byte of streamed responses.")
+    metrics.describe('investiq_gemini_requests_total', 'counter',
+                     "Gemini API attempts (retries included) by method and status code ('error' for transport errors).")
+    metrics.describe('investiq_gemini_request_duration_seconds', 'histogram',
+                     "Gemini API attempt latency, to the response headers for streams.")
+    metrics.describe('investiq_model_inference_seconds', 'histogram',
+                     "Model inference time by operation (predict, explain, peers, batch, what_if).")
+    metrics.describe('investiq_session_payload_bytes', 'histogram', "Size of stored session records.",
+                     buckets=SIZE_BUCKETS)
+    metrics.describe('investiq_llm_cache_events_total', 'counter', "LLM response cache lookups and evictions.")
+    metrics.describe('investiq_llm_parse_total', 'counter',
+                     "Structured LLM answers by outcome (parsed, repaired, failed, invalid).")
+    metrics.describe('investiq_gemini_governor_total', 'counter',
+                     "Gemini admission control decisions (admitted, queued, rejected, shed, timeouts).")
+    metrics.describe('investiq_gemini_in_flight', 'gauge', "Gemini calls holding a governor slot.")
+    metrics.describe('investiq_gemini_queued', 'gauge', "Callers waiting for a governor slot.")
+    metrics.describe('investiq_gemini_breaker_open', 'gauge', "Workers whose Gemini circuit breaker is not closed.")
+    metrics.describe('investiq_gemini_hedges_total', 'counter', "Hedged Gemini calls and how many the hedge won.")
+    metrics.describe('investiq_single_flight_total', 'counter', "Gemini calls led or coalesced by single-flight.")
+    metrics.describe('investiq_jobs_total', 'counter', "Background advice jobs by outcome.")
+    metrics.describe('investiq_drift_observations_total', 'counter',
+                     "Scored applicants by feature and histogram bin, for input drift monitoring (see /drift).")
+    return metrics
+
+
+# Shared by the app and the modules it instruments (gemini_client, session_store)
+REGISTRY = metrics_from_env()
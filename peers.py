@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+
+from loan_data import CATEGORICAL_CODES, LOAN_STATUS_CODES, columns
+
+
+# Interior bucket edges for the approval-rate tables
+CIBIL_EDGES = np.arange(350, 900, 50)
+LOAN_TO_INCOME_EDGES = np.array([2.0, 2.5, 3.0, 3.5])
+
+# Fields shown for each similar past applicant
+PEER_FIELDS = ['cibil_score', 'income_annum', 'loan_amount', 'loan_term', 'no_of_dependents']
+
+
+# Display labels for the buckets, e.g. "650–699" and "2.5x–3x"
+CIBIL_BANDS = ([f"{low}–{high - 1}" for low, high in zip([300, *CIBIL_EDGES[:-1]], CIBIL_EDGES)]
+               + [f"{CIBIL_EDGES[-1]}–900"])
+LOAN_TO_INCOME_BANDS = ([f"under {LOAN_TO_INCOME_EDGES[0]:g}x"]
+                        + [f"{low:g}x–{high:g}x" for low, high in zip(LOAN_TO_INCOME_EDGES, LOAN_TO_INCOME_EDGES[1:])]
+                        + [f"{LOAN_TO_INCOME_EDGES[-1]:g}x and over"])
+
+
+def _compact(values):
+    """
+    Returns `values` in the narrowest integer dtype that holds them exactly, or float32.
+    """
+    if np.array_equal(values, np.round(values)):
+        for dtype in (np.int8, np.int16, np.int32, np.int64):
+            info = np.iinfo(dtype)
+            if values.min() >= info.min and values.max() <= info.max:
+                return values.astype(dtype)
+    return values.astype(np.float32)
+
+
+class PeerIndex:
+    """
+    Nearest-neighbour index over the historical applications, for "applicants like you".
+
+    Features are standardized like the training pipeline (z-scores for the numerical
+    columns, 0/1 for the binary ones), so no single amount dominates the distance, and
+    indexed in a KD-tree: a query visits O(log n) leaves, which keeps lookups well under
+    a millisecond for millions of rows. The raw fields are kept column by column in the
+    narrowest dtype that holds them, and approval counts by CIBIL band and loan-to-income
+    band are tabulated up front, so the rates are array lookups.
+    """
+
+    def __init__(self, X, approved, leaf_size=40):
+        from sklearn.neighbors import KDTree
+
+        X = np.asarray(X, dtype=np.float64)
+        approved = np.asarray(approved, dtype=bool)
+        numerical = np.array([col not in CATEGORICAL_CODES for col in columns])
+        self.mean = np.where(numerical, X.mean(axis=0), 0.0)
+        self.scale = np.where(numerical, X.std(axis=0), 1.0)
+        self.scale[self.scale == 0] = 1.0
+        self.tree = KDTree(self.standardize(X), leaf_size=leaf_size)
+
+        self.fields = {col: _compact(X[:, columns.index(col)]) for col in PEER_FIELDS}
+        self.approved = approved
+        self.size = len(X)
+
+        cibil, lti = self._bands(X)
+        self.counts = np.zeros((len(CIBIL_BANDS), len(LOAN_TO_INCOME_BANDS)), dtype=np.int64)
+        self.approvals = np.zeros_like(self.counts)
+        np.add.at(self.counts, (cibil, lti), 1)
+        np.add.at(self.approvals, (cibil, lti), approved)
+
+    @classmethod
+    def from_csv(cls, path, leaf_size=40):
+        from loan_data import load_dataset
+
+        X, y = load_dataset(path)
+        return cls(X.to_numpy(), y.to_numpy() == LOAN_STATUS_CODES['approved'], leaf_size=leaf_size)
+
+    def standardize(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+    @staticmethod
+    def _bands(X):
+        X = np.atleast_2d(X)
+        income = X[:, columns.index('income_annum')]
+        ratio = X[:, columns.index('loan_amount')] / np.where(income > 0, income, np.nan)
+        cibil = np.digitize(X[:, columns.index('cibil_score')], CIBIL_EDGES)
+        # No income counts as the highest loan-to-income band
+        lti = np.digitize(np.nan_to_num(ratio, nan=np.inf), LOAN_TO_INCOME_EDGES)
+        return cibil, lti
+
+    @staticmethod
+    def _rate(approvals, count):
+        return {"approval_rate": round(float(approvals) / count, 3) if count else None, "applicants": int(count)}
+
+    def approval_rates(self, row):
+        """
+        Returns the historical approval rates for the applicant's CIBIL band, loan-to-income
+        band and the combination of both.
+        """
+        cibil, lti = (int(b[0]) for b in self._bands(row))
+        return {
+            "cibil": dict(self._rate(self.approvals[cibil].sum(), self.counts[cibil].sum()), band=CIBIL_BANDS[cibil]),
+            "loan_to_income": dict(self._rate(self.approvals[:, lti].sum(), self.counts[:, lti].sum()),
+                                   band=LOAN_TO_INCOME_BANDS[lti]),
+            "both": self._rate(self.approvals[cibil, lti], self.counts[cibil, lti]),
+            "overall": self._rate(self.approved.sum(), self.size),
+        }
+
+    def nearest(self, row, k=5):
+        """
+        Returns the `k` most similar past applicants, closest first.
+
+        Args:
+        row (np.ndarray): One encoded applicant, in `columns` order.
+        k (int): How many to return.
+
+        Returns:
+        list: Dicts with the PEER_FIELDS values, `approved` and the standardized `distance`.
+        """
+        distances, indices = self.tree.query(self.standardize(np.atleast_2d(row)), k=min(k, self.size))
+        peers = []
+        for distance, i in zip(distances[0], indices[0]):
+            peer = {col: self.fields[col][i].item() for col in PEER_FIELDS}
+            peer.update(approved=bool(self.approved[i]), distance=round(float(distance), 3))
+            peers.append(peer)
+        return peers
+
+    def compare(self, row, k=5):
+        """
+        Returns the nearest peers, how many of them were approved, and the approval-rate tables.
+        """
+        peers = self.nearest(row, k)
+        return {"peers": peers, "peers_approved": sum(p["approved"] for p in peers),
+                "rates": self.approval_rates(row)}
+
+
+def peer_index_from_env():
+    """
+    Builds the index over PEER_DATA_PATH (default data.csv); PEER_LEAF_SIZE tunes the KD-tree.
+    Returns None when the file is missing, so the app runs without peer comparisons.
+    """
+    path = os.getenv('PEER_DATA_PATH', 'data.csv')
+    if not os.path.exists(path):
+        print("[Peers Error]:", f"{path} not found, peer comparisons are disabled")
+        return None
+    return PeerIndex.from_csv(path, leaf_size=int(os.getenv('PEER_LEAF_SIZE', 40)))
@@ -0,0 +1,113 @@
+import os
+import sys
+import threading
+import time
+
+
+class SlowRequestProfiler:
+    """
+    Sampling profiler that keeps the stacks of slow requests only.
+
+    While at least one request is being tracked, a background thread samples the stack
+    of each tracked thread every `interval` seconds (via sys._current_frames, so the
+    request code runs unmodified). When a request finishes after `threshold` seconds or
+    more, its samples are written to `directory` in the folded-stack format read by
+    flamegraph.pl, speedscope and inferno; faster requests' samples are dropped.
+    """
+
+    def __init__(self, directory, threshold=1.0, interval=0.005, max_stacks=5000):
+        self.directory = directory
+        self.threshold = threshold
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> {folded stack: samples}
+        self._wake = threading.Event()
+        self._sampler_pid = None
+        self.counters = {"tracked": 0, "written": 0}
+
+    def start(self):
+        """
+        Starts tracking the calling thread's request. Returns a token for `stop`.
+        """
+        if self._sampler_pid != os.getpid():
+            # One sampler per process, started after gunicorn forks
+            self._sampler_pid = os.getpid()
+            threading.Thread(target=self._sample_loop, name='profiler', daemon=True).start()
+        thread_id = threading.get_ident()
+        with self._lock:
+            self._active[thread_id] = {}
+            self.counters["tracked"] += 1
+        self._wake.set()
+        return thread_id, time.perf_counter()
+
+    def stop(self, token, name):
+        """
+        Stops tracking and writes the samples if the request was slow.
+
+        Returns:
+        str: The path written, or None.
+        """
+        thread_id, started = token
+        with self._lock:
+            stacks = self._active.pop(thread_id, None)
+        elapsed = time.perf_counter() - started
+        if not stacks or elapsed < self.threshold:
+            return None
+
+        safe_name = ''.join(c if c.isalnum() else '_' for c in name).strip('_') or 'request'
+        path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{safe_name}-{int(elapsed * 1000)}ms.folded")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w') as f:
+                for stack, count in sorted(stacks.items()):
+                    f.write(f"{stack} {count}\n")
+        except OSError as e:
+            print("[Profiler Error]:", e)
+            return None
+        with self._lock:
+            self.counters["written"] += 1
+        return path
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _sample_loop(self):
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stack = self._fold(frame)
+                    if stack in stacks or len(stacks) < self.max_stacks:
+                        stacks[stack] = stacks.get(stack, 0) + 1
+            del frames
+            time.sleep(self.interval)
+
+
+def profiler_from_env():
+    """
+    Returns a profiler when PROFILE_SLOW_REQUESTS (the threshold in seconds) is set, else None.
+
+    Folded stacks are written to PROFILE_DIR, and PROFILE_INTERVAL is the sampling period in seconds.
+    """
+    threshold = os.getenv('PROFILE_SLOW_REQUESTS')
+    if not threshold:
+        return None
+    return SlowRequestProfiler(os.getenv('PROFILE_DIR', 'profiles'), threshold=float(threshold),
+                               interval=float(os.getenv('PROFILE_INTERVAL', 0.005)))
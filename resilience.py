@@ -0,0 +1,290 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from gemini_client import GeminiError
+
+
+# Shown in the chats while Gemini is unavailable
+DEGRADED_CHAT_MESSAGE = ("Our AI assistant is temporarily unavailable, so I can't answer right now. "
+                         "Your loan decision and saved results are not affected. Please try again in a minute.")
+
+
+class CircuitOpenError(GeminiError):
+    """
+    Raised instead of calling Gemini while the circuit breaker is open.
+    """
+
+
+def is_outage(error):
+    """
+    Returns True for errors that suggest Gemini itself is failing (transport errors,
+    timeouts, 429 and 5xx), as opposed to a bad request or an empty answer.
+    """
+    return error.status_code is None or error.status_code == 429 or error.status_code >= 500
+
+
+class CircuitBreaker:
+    """
+    Stops calling Gemini after `failure_threshold` consecutive failures.
+
+    While open, calls fail immediately with CircuitOpenError so routes can fall back
+    instead of waiting on timeouts. After `reset_timeout` seconds one trial call is let
+    through (half-open); its success closes the breaker and its failure re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self.counters = {"opened": 0, "short_circuited": 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """
+        Returns True if a call may go to Gemini now.
+        """
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.counters["short_circuited"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or (self._opened_at is None and self._failures >= self.failure_threshold):
+                if self._opened_at is None:
+                    self.counters["opened"] += 1
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, state=self._state(time.monotonic()), consecutive_failures=self._failures)
+
+
+class LatencyTracker:
+    """
+    Keeps the latencies of the most recent successful calls to estimate percentiles.
+    """
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p, min_samples=20):
+        """
+        Returns the p-th percentile latency in seconds, or None until `min_samples` are collected.
+        """
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))]
+
+
+class ResilientGemini:
+    """
+    Wraps a GeminiClient with hedged requests and a circuit breaker.
+
+    A non-streaming call that has not answered after the `hedge_percentile` latency of
+    recent calls (never sooner than `hedge_min_delay`) gets a second, identical attempt,
+    and whichever answers first wins. This trims the latency tail at the cost of a few
+    percent extra calls; no hedge is sent while the breaker is not closed. With a
+    `governor`, a hedge is an upstream call of its own: it needs a free slot (and token)
+    of its own, taken without queueing, and is skipped when the governor is at capacity,
+    so hedging never pushes calls past its limits. Outage errors (see `is_outage`) count
+    towards opening the breaker.
+    """
+
+    def __init__(self, client, breaker=None, hedge_percentile=95.0, hedge_min_delay=1.0, hedge_threads=16,
+                 governor=None):
+        self.client = client
+        self.breaker = breaker or CircuitBreaker()
+        self.governor = governor
+        self.latency = LatencyTracker()
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self._executor = ThreadPoolExecutor(max_workers=hedge_threads, thread_name_prefix='gemini-hedge')
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "hedged": 0, "hedge_wins": 0, "hedges_skipped": 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def hedge_delay(self):
+        """
+        Returns how long to wait before hedging, or None when hedging is off.
+        """
+        if self.hedge_percentile <= 0 or self.breaker.state != "closed":
+            return None
+        latency = self.latency.percentile(self.hedge_percentile)
+        return None if latency is None else max(self.hedge_min_delay, latency)
+
+    def _timed(self, prompt, json_mode):
+        start = time.monotonic()
+        text = self.client.generate_content(prompt, json_mode=json_mode)
+        self.latency.add(time.monotonic() - start)
+        return text
+
+    def _timed_with_permit(self, permit, prompt, json_mode):
+        try:
+            return self._timed(prompt, json_mode)
+        finally:
+            permit.release()
+
+    def _hedged(self, prompt, json_mode):
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._timed(prompt, json_mode)
+
+        primary = self._executor.submit(self._timed, prompt, json_mode)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        if self.governor is None:
+            hedge = self._executor.submit(self._timed, prompt, json_mode)
+        else:
+            permit = self.governor.try_acquire()
+            if permit is None:
+                self._count("hedges_skipped")
+                return primary.result()
+            hedge = self._executor.submit(self._timed_with_permit, permit, prompt, json_mode)
+        self._count("hedged")
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    text = future.result()
+                except GeminiError as e:
+                    error = e
+                    continue
+                if future is hedge:
+                    self._count("hedge_wins")
+                # The slower attempt is left to finish in the background
+                return text
+        raise error
+
+    def generate_content(self, prompt, json_mode=False):
+        """
+        Same as GeminiClient.generate_content, with hedging and the circuit breaker.
+
+        Raises:
+        CircuitOpenError: If the breaker is open.
+        GeminiError: If the call failed.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini is temporarily unavailable (circuit open).")
+        self._count("calls")
+        try:
+            text = self._hedged(prompt, json_mode)
+        except GeminiError as e:
+            self._record(e)
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return text
+
+    def _record(self, error):
+        if is_outage(error):
+            self.breaker.record_failure()
+        else:
+            # Gemini answered, the request itself was at fault
+            self.breaker.record_success()
+
+    def stream_generate_content(self, prompt):
+        """
+        Same as GeminiClient.stream_generate_content, guarded by the circuit breaker (streams are not hedged).
+
+        The outcome is recorded once the stream ends, so a stream that breaks off while it
+        is read counts as a failure, not as the success of opening it.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Gemini is temporarily unavailable (circuit open).")
+        try:
+            chunks = self.client.stream_generate_content(prompt)
+        except GeminiError as e:
+            self._record(e)
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        return self._watched(chunks)
+
+    def _watched(self, chunks):
+        try:
+            yield from chunks
+        except GeminiError as e:
+            self._record(e)
+            raise
+        except GeneratorExit:
+            # The reader stopped early (e.g. the browser went away) while Gemini was answering
+            self.breaker.record_success()
+            raise
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+        delay = self.hedge_delay()
+        stats["hedge_delay_seconds"] = round(delay, 3) if delay is not None else None
+        stats["breaker"] = self.breaker.stats()
+        return stats
+
+
+def resilient_from_env(client, governor=None):
+    """
+    Wraps `client` using GEMINI_HEDGE_PERCENTILE (0 disables hedging), GEMINI_HEDGE_MIN_DELAY,
+    GEMINI_BREAKER_FAILURES and GEMINI_BREAKER_RESET (seconds) from the environment. Hedges
+    take their own slot from `governor`, when given.
+    """
+    return ResilientGemini(
+        client,
+        breaker=CircuitBreaker(
+            failure_threshold=int(os.getenv('GEMINI_BREAKER_FAILURES', 5)),
+            reset_timeout=float(os.getenv('GEMINI_BREAKER_RESET', 30)),
+        ),
+        hedge_percentile=float(os.getenv('GEMINI_HEDGE_PERCENTILE', 95)),
+        hedge_min_delay=float(os.getenv('GEMINI_HEDGE_MIN_DELAY', 1.0)),
+        governor=governor,
+    )
@@ -0,0 +1,620 @@
+"""
+Benchmarks for InvestIQ: micro-benchmarks of the hot functions and a load harness for the routes.
+
+    python scripts/bench.py micro --out micro.json
+    python scripts/bench.py load --spawn --users 16 --duration 60 --latency 1.5 --error-rate 0.02 --out load.json
+    python scripts/bench.py load --url http://127.0.0.1:8000 --routes chat_predict further_predict_chat
+    python scripts/bench.py capacity --steps 8 16 32 64 128 --duration 30 --latency 1.5 --out capacity.json
+    python scripts/bench.py threads --threads 32
+    python scripts/bench.py compare old.json new.json
+
+`micro` times model inference on one row and on batches, the decision explanation,
+follow-up prompt building from a long conversation and the JSON extraction/repair of
+LLM answers, in-process.
+
+`load` drives /chat_predict, /business_idea, /financial_advice and the further_*_chat
+routes with `--users` concurrent simulated users, each with its own session. With
+`--spawn` it starts scripts/gemini_stub.py (with the given latency, jitter and error
+rate) and gunicorn against it in a scratch directory, and stops both afterwards;
+otherwise point `--url` at a server whose GEMINI_API_URL is already a stub. Form inputs
+differ per request (`--repeat` sends identical ones), so the LLM caches don't hide the
+Gemini path. `--probe` also loads / twice a second, to see whether chats starve it.
+
+`capacity` runs `load --spawn --probe` with each user count in `--steps` against one
+server and reports the largest count whose chat p95 stays under `--slo` seconds.
+
+`threads` checks that the app is safe under threaded workers: it hits the routes from
+many threads in-process and compares the pages and model outputs with serial runs.
+
+`micro`, `load` and `capacity` write JSON with sorted keys (p50/p95/p99 in milliseconds, or microseconds for
+`micro`, and throughput per route), so results can be diffed between releases or
+compared with `compare`.
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentiles(samples, scale=1.0, digits=3):
+    """
+    Summarizes durations in seconds as p50/p95/p99/max, multiplied by `scale`.
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100.0))] * scale, digits)
+
+    return {"p50": pick(50), "p95": pick(95), "p99": pick(99), "max": round(ordered[-1] * scale, digits)}
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"commit": commit, "python": sys.version.split()[0], "cpus": os.cpu_count(),
+            "time": time.strftime('%Y-%m-%dT%H:%M:%S%z')}
+
+
+# ---------------------------------------------------------------------------
+# Micro-benchmarks
+
+def time_call(fn, min_seconds=0.5, max_calls=100000):
+    """
+    Calls `fn` repeatedly for about `min_seconds` and returns its latency percentiles
+    (microseconds) and calls per second.
+    """
+    fn()
+    samples = []
+    deadline = time.perf_counter() + min_seconds
+    while time.perf_counter() < deadline and len(samples) < max_calls:
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return dict(percentiles(samples, scale=1e6, digits=1), calls=len(samples),
+                per_second=round(len(samples) / sum(samples), 1))
+
+
+def micro_benchmarks(min_seconds):
+    os.environ.setdefault('SECRET_KEY', 'bench')
+    import joblib
+    import app
+    from conversation_context import Conversation
+    from drift import DriftMonitor
+    from loan_data import load_dataset
+    from structured_output import extract_json, parse_llm_json
+
+    model = app.get_compiled_model()
+    peer_index = app.get_peer_index()
+    X, _ = load_dataset(os.path.join(ROOT, 'data.csv'))
+    X = X.to_numpy()
+    drift_monitor = DriftMonitor(X)
+    row = X[:1]
+    sklearn_model = joblib.load(os.path.join(ROOT, app.MODEL_PATH))
+
+    conversation = Conversation.start(app.predict_message_prompt("India"), [{"myCountry": {
+        "organizationName": "Bank", "link": "https://example.com"}}])
+    for turn in range(30):
+        conversation.add_turn(f"Question {turn}: how should I plan my repayments for the next year?",
+                              "Keep a reserve of three months of repayments and review your cash flow monthly. " * 4)
+
+    answer = json.dumps([{"Business_Idea": f"Idea {i}", "sector": "Food", "link": "https://example.com"}
+                         for i in range(5)], indent=2)
+    fenced = f"Here are some ideas:\n```json\n{answer}\n```\nGood luck!"
+    broken = fenced.replace('"Food"', '“Food”').replace('}\n]', '},\n]')
+    truncated = answer[:len(answer) * 2 // 3]
+
+    benchmarks = {
+        "predict_row": lambda: model.predict(row),
+        "predict_batch_100": lambda: model.predict(X[:100]),
+        "predict_batch_1000": lambda: model.predict(X[:1000]),
+        "predict_all_rows": lambda: model.predict(X),
+        "sklearn_predict_row": lambda: sklearn_model.predict(row),
+        "explain_row": lambda: app.explain_decision(model, row),
+        "what_if_row": lambda: app.what_if(model, X[1]),
+        "peers_row": lambda: peer_index.compare(X[1]),
+        "drift_record_row": lambda: drift_monitor.record(row),
+        "further_prompt_30_turns": lambda: app.build_further_prompt(1, "What should I do next?", conversation),
+        "extract_json_fenced": lambda: extract_json(fenced),
+        "parse_json_fenced": lambda: parse_llm_json(fenced, app.BUSINESS_SCHEMA, 'bench'),
+        "parse_json_repaired": lambda: parse_llm_json(broken, app.BUSINESS_SCHEMA, 'bench'),
+        "parse_json_truncated": lambda: parse_llm_json(truncated, app.BUSINESS_SCHEMA, 'bench'),
+    }
+    results = {}
+    for name, fn in benchmarks.items():
+        results[name] = time_call(fn, min_seconds)
+        print(f"{name:28} p50 {results[name]['p50']:>10} us  p99 {results[name]['p99']:>10} us", file=sys.stderr)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Load harness
+
+QUESTIONS = ["How can I improve my chances next time?", "What documents do lenders usually ask for?",
+             "Should I take a shorter loan term?", "How do I estimate my monthly repayments?"]
+COUNTRIES = ["India", "Nigeria", "Kenya", "Brazil", "Germany", "Canada"]
+DOMAINS = ["food", "retail", "technology", "agriculture", "logistics", "education"]
+ROUTES = ['chat_predict', 'further_predict_chat', 'business_idea', 'further_business_chat', 'financial_advice',
+          'further_finance_chat']
+
+
+def load_applicants(path):
+    """
+    Reads data.csv rows as chat_predict form fields.
+    """
+    fields = {'no_of_dependents': 'depend', 'income_annum': 'income', 'loan_amount': 'loan_amount',
+              'loan_term': 'loan_term', 'cibil_score': 'score', 'residential_assets_value': 'resident',
+              'commercial_assets_value': 'commercial', 'luxury_assets_value': 'luxury', 'bank_asset_value': 'bank'}
+    applicants = []
+    with open(path, newline='') as f:
+        for record in csv.DictReader(f, skipinitialspace=True):
+            form = {field: record[col].strip() for col, field in fields.items()}
+            form.update(education='0' if record['education'].strip() == 'Graduate' else '1',
+                        employment='1' if record['self_employed'].strip() == 'Yes' else '0',
+                        marital_status='married', property_area='urban', loan_purpose='business')
+            applicants.append(form)
+    return applicants
+
+
+class LoadUser(threading.Thread):
+    """
+    One simulated user: starts a session, then cycles through the routes until `deadline`.
+    """
+
+    def __init__(self, harness, number):
+        super().__init__(daemon=True)
+        self.harness = harness
+        self.number = number
+        self.random = random.Random(number)
+
+    def advice_form(self, serial):
+        args = self.harness.args
+        domain = self.random.choice(DOMAINS)
+        form = {"domain_interest": domain if args.repeat else f"{domain} {self.number}-{serial}",
+                "country_interest": self.random.choice(COUNTRIES), "capital_loan": "loan", "amount": "25000",
+                "loan_pay_month": "24",
+                "description": "A small shop" if args.repeat else f"A small shop, plan {self.number}-{serial}"}
+        return form
+
+    def request(self, route, session, serial):
+        args = self.harness.args
+        url = f"{args.url}/{route}"
+        if route == 'chat_predict':
+            return session.post(url, data=self.random.choice(self.harness.applicants), timeout=args.timeout)
+        if route in ('business_idea', 'financial_advice'):
+            return session.post(url, data=self.advice_form(serial), timeout=args.timeout)
+        if args.stream:
+            url += '?stream=1'
+        return session.post(url, data={"question": self.random.choice(QUESTIONS)}, timeout=args.timeout)
+
+    def run(self):
+        import requests
+
+        harness = self.harness
+        session = requests.Session()
+        try:
+            session.post(f"{harness.args.url}/next_session", timeout=harness.args.timeout,
+                         data={"name": f"user{self.number}", "country": self.random.choice(COUNTRIES)})
+        except requests.RequestException as e:
+            harness.record('next_session', 0.0, f"error: {type(e).__name__}")
+            return
+
+        serial = 0
+        while time.monotonic() < harness.deadline:
+            for route in harness.args.routes:
+                if time.monotonic() >= harness.deadline:
+                    break
+                serial += 1
+                start = time.perf_counter()
+                try:
+                    response = self.request(route, session, serial)
+                    response.content  # read streamed bodies to the end
+                    status = str(response.status_code)
+                except requests.RequestException as e:
+                    status = f"error: {type(e).__name__}"
+                harness.record(route, time.perf_counter() - start, status)
+
+
+class LoadHarness:
+    def __init__(self, args):
+        self.args = args
+        self.applicants = load_applicants(os.path.join(ROOT, 'data.csv'))
+        self.deadline = 0.0
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, route, seconds, status):
+        with self._lock:
+            entry = self.samples.setdefault(route, {"latencies": [], "status": {}})
+            entry["latencies"].append(seconds)
+            entry["status"][status] = entry["status"].get(status, 0) + 1
+
+    def probe(self):
+        import requests
+
+        while time.monotonic() < self.deadline:
+            start = time.perf_counter()
+            try:
+                status = str(requests.get(f"{self.args.url}/", timeout=self.args.timeout).status_code)
+            except requests.RequestException as e:
+                status = f"error: {type(e).__name__}"
+            self.record('index', time.perf_counter() - start, status)
+            time.sleep(0.5)
+
+    def run(self):
+        started = time.monotonic()
+        self.deadline = started + self.args.duration
+        users = [LoadUser(self, number) for number in range(self.args.users)]
+        if getattr(self.args, 'probe', False):
+            users.append(threading.Thread(target=self.probe, daemon=True))
+        for user in users:
+            user.start()
+        for user in users:
+            user.join()
+        elapsed = time.monotonic() - started
+
+        routes = {}
+        for route, entry in sorted(self.samples.items()):
+            count = len(entry["latencies"])
+            ok = sum(n for status, n in entry["status"].items() if status.startswith('2'))
+            routes[route] = dict(percentiles(entry["latencies"], scale=1e3, digits=1), requests=count, ok=ok,
+                                 error_rate=round(1 - ok / count, 4), throughput_rps=round(count / elapsed, 2),
+                                 status=entry["status"])
+        total = sum(r["requests"] for r in routes.values())
+        return {"routes": routes, "elapsed_seconds": round(elapsed, 1),
+                "total": {"requests": total, "throughput_rps": round(total / elapsed, 2)}}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=60.0):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout} seconds")
+
+
+def spawn_servers(args, workdir):
+    """
+    Starts the Gemini stub and gunicorn (from the repo, with scratch databases in
+    `workdir`) and returns their processes.
+    """
+    stub_port, app_port = free_port(), free_port()
+    stub = subprocess.Popen([sys.executable, os.path.join(ROOT, 'scripts', 'gemini_stub.py'), '--port', str(stub_port),
+                             '--latency', str(args.latency), '--jitter', str(args.jitter),
+                             '--error-rate', str(args.error_rate)], stdout=subprocess.DEVNULL)
+    env = dict(os.environ, SECRET_KEY='bench', GEMINI_API_KEY='stub',
+               GEMINI_API_URL=f"http://127.0.0.1:{stub_port}/v1beta/models/stub",
+               SESSION_DB=os.path.join(workdir, 'sessions.sqlite3'), JOB_DB=os.path.join(workdir, 'jobs.sqlite3'),
+               PYTHONWARNINGS='ignore')
+    command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(ROOT, 'gunicorn.conf.py'), '--bind',
+               f"127.0.0.1:{app_port}", '--chdir', ROOT] + args.gunicorn_args.split() + ['app:app']
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    args.url = f"http://127.0.0.1:{app_port}"
+    try:
+        wait_for(f"http://127.0.0.1:{stub_port}/")
+        wait_for(args.url + '/')
+    except RuntimeError:
+        stop([stub, server])
+        raise
+    return [stub, server]
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def load_test(args):
+    processes, workdir = [], None
+    if args.spawn:
+        workdir = tempfile.mkdtemp(prefix='investiq-bench-')
+        processes = spawn_servers(args, workdir)
+    try:
+        report = LoadHarness(args).run()
+    finally:
+        stop(processes)
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report["config"] = {"url": args.url, "users": args.users, "duration": args.duration, "routes": args.routes,
+                        "stream": args.stream, "repeat": args.repeat}
+    if args.spawn:
+        report["config"].update(stub_latency=args.latency, stub_jitter=args.jitter, stub_error_rate=args.error_rate,
+                                gunicorn_args=args.gunicorn_args)
+    return report
+
+
+
+# ---------------------------------------------------------------------------
+# Thread safety and capacity
+
+def thread_safety_check(threads, rounds):
+    """
+    Runs the app in-process from `threads` threads at once, as a gthread worker would,
+    and checks that nothing shared between them gets corrupted.
+
+    Each thread keeps its own session and posts /chat_predict and /further_predict_chat
+    (against an in-process Gemini stub), so the model, the LLM caches, the governor,
+    single-flight, the pooled HTTP client, the session store and the metrics registry are
+    all hit concurrently. Every /chat_predict page must match the page rendered for the
+    same applicant by a single thread, model outputs must match the serial results, and
+    the shared counters must add up afterwards.
+
+    Returns:
+    dict: Failures (empty when everything checked out) and the counts behind them.
+    """
+    sys.path.insert(0, os.path.join(ROOT, 'scripts'))
+    from gemini_stub import StubServer
+
+    config = argparse.Namespace(latency=0.02, jitter=0.02, error_rate=0.0)
+    stub = StubServer(('127.0.0.1', 0), config)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    os.environ.update(SECRET_KEY=os.getenv('SECRET_KEY', 'bench'), GEMINI_API_KEY='stub', SESSION_STORE='memory',
+                      GEMINI_API_URL=f"http://127.0.0.1:{stub.server_address[1]}/v1beta/models/stub",
+                      GEMINI_MAX_CONCURRENT=str(threads), LLM_THREADS=str(threads))
+    import numpy as np
+    import app
+    from loan_data import load_dataset
+    from metrics import REGISTRY
+
+    model = app.get_compiled_model()
+    X = load_dataset(os.path.join(ROOT, 'data.csv'))[0].to_numpy()[:256]
+    expected_proba = model.predict_proba(X)
+    expected_contributions = model.contributions(X)[1]
+    applicants = load_applicants(os.path.join(ROOT, 'data.csv'))[:16]
+
+    def post(client, path, data):
+        # Closing the response runs its call_on_close hooks (the request metrics), as a server would
+        with client.post(path, data=data) as response:
+            return response.status_code, response.get_data()
+
+    def start_session(client, number):
+        post(client, '/next_session', {"name": f"user{number}", "country": COUNTRIES[number % len(COUNTRIES)]})
+
+    # Reference pages, rendered one at a time (the loan-provider answers are cached per country by then)
+    expected_pages = {}
+    for number in range(len(COUNTRIES)):
+        client = app.app.test_client()
+        start_session(client, number)
+        for index, applicant in enumerate(applicants):
+            expected_pages[number, index] = post(client, '/chat_predict', applicant)[1]
+
+    failures = []
+    lock = threading.Lock()
+    totals = {"requests": 0}
+    requests_before = sum(v for (name, _), v in REGISTRY._counters.items() if name == 'investiq_http_requests_total')
+    barrier = threading.Barrier(threads)
+
+    def run(number):
+        client = app.app.test_client()
+        start_session(client, number % len(COUNTRIES))
+        rng = random.Random(number)
+        barrier.wait()
+        sent = 1
+        for _ in range(rounds):
+            rows = slice(rng.randrange(0, 192), None)
+            if not np.array_equal(model.predict_proba(X[rows]), expected_proba[rows]):
+                failures.append(f"thread {number}: predict_proba differs from the serial result")
+            if not np.array_equal(model.contributions(X[rows])[1], expected_contributions[rows]):
+                failures.append(f"thread {number}: contributions differ from the serial result")
+            index = rng.randrange(len(applicants))
+            page = post(client, '/chat_predict', applicants[index])[1]
+            if page != expected_pages[number % len(COUNTRIES), index]:
+                failures.append(f"thread {number}: /chat_predict page differs for applicant {index}")
+            status = post(client, '/further_predict_chat', {"question": rng.choice(QUESTIONS)})[0]
+            if status != 200:
+                failures.append(f"thread {number}: /further_predict_chat returned {status}")
+            sent += 2
+        with lock:
+            totals["requests"] += sent
+
+    workers = [threading.Thread(target=run, args=(number,)) for number in range(threads)]
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.monotonic() - started
+    stub.shutdown()
+
+    governor = app.llm_governor.stats()
+    if governor["active"] or governor["queued_now"]:
+        failures.append(f"governor left {governor['active']} slots held and {governor['queued_now']} callers queued")
+    requests_after = sum(v for (name, _), v in REGISTRY._counters.items() if name == 'investiq_http_requests_total')
+    if requests_after - requests_before != totals["requests"]:
+        failures.append(f"metrics counted {requests_after - requests_before} requests, {totals['requests']} were sent")
+    return {"failures": failures, "threads": threads, "rounds": rounds, "requests": totals["requests"],
+            "gemini_calls": stub.requests, "elapsed_seconds": round(elapsed, 1)}
+
+
+def capacity_test(args):
+    """
+    Finds how many concurrent chat users one server sustains.
+
+    Starts the stub and gunicorn once, then runs the load test with each user count in
+    `--steps`. While each step runs, a probe loads / every half second, to show whether
+    chats starve the other pages. A step is sustained when the chat routes keep their p95
+    under `--slo` seconds with at most `--max-error-rate` failures; the report gives the
+    largest sustained step.
+    """
+    workdir = tempfile.mkdtemp(prefix='investiq-bench-')
+    args.spawn = True
+    processes = spawn_servers(args, workdir)
+    steps, sustained = {}, 0
+    try:
+        for users in args.steps:
+            args.users = users
+            report = LoadHarness(args).run()
+            chats = [r for name, r in report["routes"].items() if name in args.routes]
+            requests = sum(r["requests"] for r in chats)
+            errors = sum(r["requests"] - r["ok"] for r in chats)
+            p95 = max((r["p95"] for r in chats), default=0.0) / 1e3
+            probe = report["routes"].get('index', {})
+            ok = requests > 0 and p95 <= args.slo and errors / requests <= args.max_error_rate
+            steps[str(users)] = {"sustained": ok, "chat_p95_seconds": round(p95, 3),
+                                 "error_rate": round(errors / requests, 4) if requests else None,
+                                 "throughput_rps": round(requests / report["elapsed_seconds"], 2),
+                                 "index_p95_ms": probe.get("p95"), "index_max_ms": probe.get("max")}
+            print(f"{users:5} users  chat p95 {p95:7.3f}s  index p95 {probe.get('p95')} ms  "
+                  f"{'ok' if ok else 'over the SLO'}", file=sys.stderr)
+            if not ok:
+                break
+            sustained = users
+    finally:
+        stop(processes)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {"steps": steps, "sustained_users": sustained,
+            "config": {"slo_seconds": args.slo, "max_error_rate": args.max_error_rate, "duration": args.duration,
+                       "routes": args.routes, "stub_latency": args.latency, "stub_jitter": args.jitter,
+                       "gunicorn_args": args.gunicorn_args}}
+
+# ---------------------------------------------------------------------------
+
+def _changes(before, result, keys):
+    changes = []
+    for key in keys:
+        if result.get(key) is not None and before.get(key):
+            changes.append(f"{key} {before[key]} -> {result[key]} ({(result[key] / before[key] - 1) * 100:+.1f}%)")
+    return ", ".join(changes)
+
+
+def compare(old_path, new_path):
+    """
+    Prints the change in p50/p99 (and throughput for load reports) between two reports.
+    For capacity reports, prints the change in sustained users and in chat p95 per step.
+    """
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    section = next((key for key in ('steps', 'routes', 'benchmarks') if key in new), None)
+    if section is None or section not in old:
+        sys.exit(f"{old_path} and {new_path} are not reports of the same kind")
+
+    if section == 'steps':
+        before, after = old.get("sustained_users"), new.get("sustained_users")
+        print(f"{'sustained_users':28} {before} -> {after}")
+        for users in sorted(set(old["steps"]) | set(new["steps"]), key=int):
+            if users not in new["steps"]:
+                print(f"{users + ' users':28} (not in new report)")
+            elif users not in old["steps"]:
+                print(f"{users + ' users':28} (new)")
+            else:
+                print(f"{users + ' users':28} " + _changes(old["steps"][users], new["steps"][users],
+                                                          ('chat_p95_seconds', 'throughput_rps', 'index_p95_ms')))
+        return
+
+    for name, result in sorted(new[section].items()):
+        before = old[section].get(name)
+        if not before:
+            print(f"{name:28} (new)")
+            continue
+        print(f"{name:28} " + _changes(before, result, ('p50', 'p99', 'throughput_rps', 'per_second')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    micro = commands.add_parser('micro', help="time the hot functions in-process")
+    micro.add_argument('--seconds', type=float, default=0.5, help="time spent on each benchmark")
+    micro.add_argument('--out', help="write the JSON report to this file")
+
+    # Shared by load and capacity
+    server_options = argparse.ArgumentParser(add_help=False)
+    server_options.add_argument('--url', default='http://127.0.0.1:8000')
+    server_options.add_argument('--stream', action='store_true',
+                                help="ask the further_*_chat routes for streamed replies")
+    server_options.add_argument('--repeat', action='store_true',
+                                help="send identical advice forms (measures the cache path)")
+    server_options.add_argument('--timeout', type=float, default=120.0, help="per-request timeout in seconds")
+    server_options.add_argument('--latency', type=float, default=1.0, help="stub latency in seconds (with --spawn)")
+    server_options.add_argument('--jitter', type=float, default=0.5,
+                                help="stub latency jitter in seconds (with --spawn)")
+    server_options.add_argument('--error-rate', type=float, default=0.0, help="stub error rate (with --spawn)")
+    server_options.add_argument('--gunicorn-args', default='',
+                                help="extra gunicorn arguments (with --spawn), e.g. '--workers 4'")
+
+    load = commands.add_parser('load', help="drive the routes with concurrent users", parents=[server_options])
+    load.add_argument('--spawn', action='store_true', help="start the Gemini stub and gunicorn for the run")
+    load.add_argument('--users', type=int, default=8)
+    load.add_argument('--duration', type=float, default=30.0, help="seconds")
+    load.add_argument('--routes', nargs='+', default=ROUTES, choices=ROUTES)
+    load.add_argument('--probe', action='store_true', help="also load / twice a second, to see if chats starve it")
+    load.add_argument('--out', help="write the JSON report to this file")
+
+    capacity = commands.add_parser('capacity', help="find the concurrent chat users one server sustains",
+                                   parents=[server_options])
+    capacity.add_argument('--steps', nargs='+', type=int, default=[4, 8, 16, 32, 64, 128, 256])
+    capacity.add_argument('--duration', type=float, default=30.0, help="seconds per step")
+    capacity.add_argument('--routes', nargs='+', default=['chat_predict', 'further_predict_chat'], choices=ROUTES)
+    capacity.add_argument('--slo', type=float, default=5.0, help="highest acceptable chat p95, in seconds")
+    capacity.add_argument('--max-error-rate', type=float, default=0.01)
+    capacity.add_argument('--out', help="write the JSON report to this file")
+
+    safety = commands.add_parser('threads', help="check the app for races under concurrent threads")
+    safety.add_argument('--threads', type=int, default=32)
+    safety.add_argument('--rounds', type=int, default=20, help="request pairs per thread")
+
+    diff = commands.add_parser('compare', help="compare two reports")
+    diff.add_argument('old')
+    diff.add_argument('new')
+
+    args = parser.parse_args()
+    if args.command == 'compare':
+        compare(args.old, args.new)
+        return
+
+    if args.command == 'threads':
+        report = thread_safety_check(args.threads, args.rounds)
+        print(json.dumps(report, indent=2, sort_keys=True))
+        sys.exit(1 if report["failures"] else 0)
+
+    if args.command == 'micro':
+        report = {"benchmarks": micro_benchmarks(args.seconds)}
+    elif args.command == 'capacity':
+        args.probe = True
+        report = capacity_test(args)
+    else:
+        report = load_test(args)
+    report["environment"] = environment()
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""
+Builds the fingerprinted, precompressed copies of static/ that the app serves with long-lived caching.
+
+    python scripts/build_static.py
+
+Writes static/dist/ (a copy of every file with a content hash in its name, .gz copies of
+text formats, and .br copies when the brotli package is installed) and
+static/dist/manifest.json. Run it on deploy and after changing anything under static/;
+the app picks the manifest up at startup (see static_assets.py).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from static_assets import brotli, build
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--static', default=os.path.join(ROOT, 'static'))
+    args = parser.parse_args()
+
+    started = time.time()
+    totals = build(args.static)
+    totals["seconds"] = round(time.time() - started, 1)
+    if brotli is None:
+        print("brotli is not installed; only gzip copies were written", file=sys.stderr)
+    print(json.dumps(totals, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+"""
+Builds smaller variants of the served model and reports what each one costs and saves.
+
+    python scripts/compact_model.py                                  # print the trade-off report
+    python scripts/compact_model.py --quantize --report compact.json # also quantized variants, JSON report
+    python scripts/compact_model.py --save "trees=25" random_forest_model.npy
+
+Starting from the loaded forest (random_forest_model.pkl by default), the candidates are:
+
+    trees=K          the first K trees (trees of a random forest are exchangeable)
+    depth=D          every tree cut at depth D (cut nodes predict the class mix that reached them)
+    trees=K,depth=D  both
+    distilled-forest a small RandomForest trained on the full model's labels
+    distilled-gbdt   a GradientBoostingClassifier trained on the full model's labels
+    ...+q            float32 thresholds/values and int32 indices (with --quantize)
+
+For every candidate the report lists accuracy on the data.csv hold-out (the 25% the
+model was not trained on, split as in Prediction.ipynb), agreement with the full model on
+all rows, single-row and per-row batch latency, the bytes of its node arrays, the memory
+it actually keeps resident and the artifact size on disk. Resident memory is measured in
+a fresh interpreter per candidate: the growth of its RSS from loading the artifact (as
+served, memory-mapped) and predicting every row. The "sklearn pickle" row is the
+unpickled model served before CompiledForest.
+
+`--save NAME DIR` writes one candidate as a memory-mappable artifact; serve it with
+COMPILED_MODEL_PATH=DIR.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import joblib
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from forest_engine import CompiledForest
+from loan_data import columns, load_dataset
+
+
+# Run in a fresh interpreter, so each candidate's resident memory is measured alone
+RESIDENT_PROBE = """
+import ctypes, ctypes.util, gc, os, resource, sys
+sys.path.insert(0, sys.argv[3])
+import joblib
+import sklearn.ensemble
+from forest_engine import CompiledForest
+from loan_data import load_dataset
+
+def rss():
+    # Hand freed heap pages back first, so only memory still in use is counted
+    gc.collect()
+    if ctypes.util.find_library('c'):
+        getattr(ctypes.CDLL(ctypes.util.find_library('c')), 'malloc_trim', lambda pad: None)(0)
+    if os.path.exists('/proc/self/statm'):
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+X = load_dataset(sys.argv[2])[0].to_numpy()
+before = rss()
+model = joblib.load(sys.argv[1]) if sys.argv[1].endswith('.pkl') else CompiledForest.load(sys.argv[1])
+for start in range(0, len(X), 256):
+    model.predict(X[start:start + 256])
+print(rss() - before)
+"""
+
+
+def resident_kb(path, data):
+    """
+    Returns how much the RSS of a fresh interpreter grows, in KB, when it loads the model
+    at `path` (a CompiledForest directory or a pickle) and predicts every row of `data`.
+    """
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-c', RESIDENT_PROBE, path, data, ROOT],
+                            capture_output=True, text=True, check=True)
+    return round(int(result.stdout.split()[-1]) / 1024, 1)
+
+
+def candidate_builders(model, X_train, teacher_labels):
+    """
+    Returns (name, build) pairs; `build()` returns a CompiledForest.
+    """
+    builders = [("full", lambda: CompiledForest.from_sklearn(model))]
+    for n_trees in (50, 25, 10):
+        builders.append((f"trees={n_trees}", lambda k=n_trees: CompiledForest.from_sklearn(model, n_trees=k)))
+    for depth in (6, 5, 4):
+        builders.append((f"depth={depth}", lambda d=depth: CompiledForest.from_sklearn(model, max_depth=d)))
+    builders.append(("trees=25,depth=5", lambda: CompiledForest.from_sklearn(model, n_trees=25, max_depth=5)))
+    builders.append(("distilled-forest", lambda: CompiledForest.from_sklearn(
+        RandomForestClassifier(n_estimators=20, max_depth=6, random_state=42).fit(X_train, teacher_labels))))
+    builders.append(("distilled-gbdt", lambda: CompiledForest.from_sklearn_gbdt(
+        GradientBoostingClassifier(n_estimators=60, max_depth=3, random_state=42).fit(X_train, teacher_labels))))
+    return builders
+
+
+def latency_us(predict, X, repeats=300):
+    """
+    Returns the median single-row latency and the best per-row batch latency, in microseconds.
+    """
+    row = X[:1]
+    predict(row)
+    single = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict(row)
+        single.append(time.perf_counter() - start)
+    batch = []
+    for _ in range(5):
+        start = time.perf_counter()
+        predict(X)
+        batch.append(time.perf_counter() - start)
+    batch = min(batch)
+    return round(float(np.median(single)) * 1e6, 1), round(batch / len(X) * 1e6, 3)
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def evaluate(name, engine, X, X_test, y_test, reference, data):
+    single_us, batch_us = latency_us(engine.predict, X)
+    with tempfile.TemporaryDirectory() as path:
+        engine.save(path)
+        artifact_bytes = directory_size(path)
+        resident = resident_kb(path, data)
+    return {
+        "name": name,
+        "trees": engine.n_estimators,
+        "nodes": int(len(engine.feature)),
+        "max_depth": engine.max_depth,
+        "holdout_accuracy": round(float((engine.predict(X_test) == y_test).mean()), 4),
+        "agreement": round(float((engine.predict(X) == reference).mean()), 4),
+        "single_row_us": single_us,
+        "batch_us_per_row": batch_us,
+        "array_kb": round(engine.nbytes / 1024, 1),
+        "resident_kb": resident,
+        "artifact_kb": round(artifact_bytes / 1024, 1),
+    }
+
+
+def evaluate_pickle(path, X, X_test, y_test, data):
+    model = joblib.load(path)
+    # The tree arrays are allocated by sklearn's Cython code; their buffers are exported through __getstate__
+    memory = sum(state["nodes"].nbytes + state["values"].nbytes
+                 for state in (e.tree_.__getstate__() for e in model.estimators_))
+    single_us, batch_us = latency_us(model.predict, X)
+    return {
+        "name": "sklearn pickle",
+        "trees": len(model.estimators_),
+        "nodes": int(sum(e.tree_.node_count for e in model.estimators_)),
+        "max_depth": max(e.tree_.max_depth for e in model.estimators_),
+        "holdout_accuracy": round(float((model.predict(X_test) == y_test).mean()), 4),
+        "agreement": 1.0,
+        "single_row_us": single_us,
+        "batch_us_per_row": batch_us,
+        "array_kb": round(memory / 1024, 1),
+        "resident_kb": resident_kb(path, data),
+        "artifact_kb": round(os.path.getsize(path) / 1024, 1),
+    }
+
+
+def print_table(rows):
+    headers = list(rows[0])
+    widths = [max(len(h), *(len(str(r[h])) for r in rows)) for h in headers]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(row[h]).ljust(w) for h, w in zip(headers, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=os.path.join(ROOT, 'random_forest_model.pkl'))
+    parser.add_argument('--data', default=os.path.join(ROOT, 'data.csv'))
+    parser.add_argument('--quantize', action='store_true', help="also report quantized (+q) variants")
+    parser.add_argument('--report', help="write the report as JSON to this file")
+    parser.add_argument('--save', nargs=2, metavar=('NAME', 'DIR'), help="write candidate NAME to DIR")
+    args = parser.parse_args()
+
+    model = joblib.load(args.model)
+    X_frame, y_frame = load_dataset(args.data)
+    X_train, X_test, _, y_test = train_test_split(X_frame, y_frame, test_size=0.25, random_state=42)
+    X, X_test, y_test = X_frame.to_numpy(), X_test.to_numpy(), y_test.to_numpy()
+    reference = model.predict(X_frame)
+    # Students learn the full model's decisions, not the original labels
+    teacher_labels = model.predict(X_train)
+
+    builders = candidate_builders(model, X_train, teacher_labels)
+    if args.save:
+        builders = [b for b in builders if b[0] == args.save[0].removesuffix('+q')]
+        if not builders:
+            sys.exit(f"Unknown candidate: {args.save[0]}")
+
+    rows = [] if args.save else [evaluate_pickle(args.model, X_frame, X_test, y_test, args.data)]
+    engines = {}
+    for name, build in builders:
+        engine = build()
+        engines[name] = engine
+        if args.quantize or (args.save and args.save[0].endswith('+q')):
+            engines[name + '+q'] = engine.quantized()
+    for name, engine in engines.items():
+        rows.append(evaluate(name, engine, X, X_test, y_test, reference, args.data))
+
+    print_table(rows)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(rows, f, indent=2)
+
+    if args.save:
+        name, path = args.save
+        row = next(r for r in rows if r["name"] == name)
+        engines[name].save(path, metadata={"feature_order": columns, "variant": name, "report": row,
+                                           "source_model": os.path.basename(args.model)})
+        print(f"Wrote {name} to {path}; serve it with COMPILED_MODEL_PATH={path}")
+
+
+if __name__ == '__main__':
+    main()
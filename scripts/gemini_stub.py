@@ -0,0 +1,131 @@
+"""
+A local stand-in for the Gemini API, for load tests and offline development.
+
+    python scripts/gemini_stub.py --port 8089 --latency 1.5 --jitter 0.5 --error-rate 0.02
+    GEMINI_API_URL=http://127.0.0.1:8089/v1beta/models/stub gunicorn -c gunicorn.conf.py app:app
+
+Answers generateContent and streamGenerateContent (alt=sse) for any model path. Replies
+are canned but shaped like the real ones: the loan-provider, business idea and financial
+advice prompts get JSON in the format the prompt asks for, anything else gets a short
+chat answer. Each request waits `latency` seconds, plus uniform jitter of up to `jitter`,
+and fails with a 503 with probability `error-rate` (a 429 for one in five of those).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+LOAN_PROVIDERS = [
+    {"myCountry": {"organizationName": "Stub National Bank", "link": "https://example.com/national-bank"},
+     "otherCountry": {"organizationName": "Stub Global Lending", "link": "https://example.com/global", "Country": "Stubland"}},
+]
+BUSINESS_IDEAS = [
+    {"Business_Idea": "Neighbourhood meal-prep delivery", "sector": "Food", "link": "https://example.com/meal-prep"},
+    {"Business_Idea": "Refurbished electronics shop", "sector": "Retail", "link": "https://example.com/refurb"},
+]
+FINANCIAL_ADVICE = {"financial_breakdown": "Keep 30% of the capital as a reserve, spend 50% on stock and equipment "
+                                           "and 20% on marketing for the first six months.",
+                    "link": "https://example.com/breakdown"}
+CHAT_ANSWER = ("Start by checking your cash flow each month, keep an emergency reserve, and compare offers from at "
+               "least three lenders before you commit.")
+
+
+def answer_for(prompt):
+    """
+    Returns the stub's reply text for a prompt.
+    """
+    if '"myCountry"' in prompt:
+        return json.dumps(LOAN_PROVIDERS)
+    if '"Business_Idea"' in prompt:
+        return json.dumps(BUSINESS_IDEAS)
+    if '"financial_breakdown"' in prompt:
+        return json.dumps(FINANCIAL_ADVICE)
+    return CHAT_ANSWER
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        config = self.server.config
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            prompt = payload["contents"][-1]["parts"][0]["text"]
+        except (ValueError, KeyError, IndexError):
+            self._send_json(400, {"error": {"code": 400, "message": "Invalid request."}})
+            return
+
+        self.server.count()
+        time.sleep(config.latency + random.uniform(0, config.jitter))
+        if random.random() < config.error_rate:
+            status = 429 if random.random() < 0.2 else 503
+            self._send_json(status, {"error": {"code": status, "message": "Injected error."}})
+            return
+
+        text = answer_for(prompt)
+        if ':streamGenerateContent' not in self.path:
+            self._send_json(200, {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]})
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        words = text.split(' ')
+        for i in range(0, len(words), 8):
+            chunk = ' '.join(words[i:i + 8]) + (' ' if i + 8 < len(words) else '')
+            event = {"candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}}]}
+            self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode())
+            self.wfile.flush()
+        self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, StubHandler)
+        self.config = config
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=1.0, help="base seconds per request")
+    parser.add_argument('--jitter', type=float, default=0.5, help="extra uniform random seconds per request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503/429")
+    config = parser.parse_args()
+
+    server = StubServer((config.host, config.port), config)
+    print(f"Gemini stub on http://{config.host}:{config.port}/v1beta/models/stub", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Served {server.requests} requests")
+
+
+if __name__ == '__main__':
+    main()
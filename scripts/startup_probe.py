@@ -0,0 +1,97 @@
+"""
+Measures InvestIQ cold start time and memory use.
+
+    python scripts/startup_probe.py                 # cold start of a fresh interpreter
+    python scripts/startup_probe.py --pid <master>  # RSS/PSS of a running gunicorn master and its workers
+
+Cold start reports the time to import app.py, the time to the first prediction (which
+includes loading the model when it is loaded lazily) and the resulting RSS. PSS splits
+shared pages between the processes mapping them, so it is the number to compare when
+checking that workers share the model instead of holding private copies.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COLD_START = """
+import json, time
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+row = {'no_of_dependents': 2, 'education': 0, 'self_employed': 1, 'income_annum': 9600000,
+       'loan_amount': 29900000, 'loan_term': 12, 'cibil_score': 778, 'residential_assets_value': 2400000,
+       'commercial_assets_value': 17600000, 'luxury_assets_value': 22700000, 'bank_asset_value': 8000000}
+app.get_compiled_model().predict(app.encode_applicant(row))
+t2 = time.perf_counter()
+print(json.dumps({"import_s": t1 - t0, "first_prediction_s": t2 - t1}))
+"""
+
+
+def memory_kb(pid):
+    """
+    Returns the RSS and PSS (in kB) of a process, read from /proc.
+    """
+    usage = {}
+    for name, key in (('status', 'VmRSS'), ('smaps_rollup', 'Pss')):
+        try:
+            with open(f'/proc/{pid}/{name}') as f:
+                for line in f:
+                    if line.startswith(key + ':'):
+                        usage[key.lower() + '_kb'] = int(line.split()[1])
+                        break
+        except OSError:
+            pass
+    return usage
+
+
+def child_pids(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(p) for p in f.read().split()]
+    except OSError:
+        return []
+
+
+def cold_start():
+    code = COLD_START + "\nimport os\nprint(os.getpid())\nimport sys; sys.stdout.flush(); sys.stdin.read()"
+    # stderr goes to a file, so a chatty child cannot block on a full pipe while stdout is read
+    with tempfile.TemporaryFile('w+') as stderr:
+        proc = subprocess.Popen([sys.executable, '-W', 'ignore', '-c', code], cwd=ROOT, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, stderr=stderr, text=True)
+        # The last two lines are the timings and the pid; earlier lines are the app's own output
+        lines = []
+        while len(lines) < 2 or not lines[-1].strip().isdigit():
+            line = proc.stdout.readline()
+            if line == '':
+                # The child exited (or crashed) before reporting
+                proc.stdin.close()
+                returncode = proc.wait()
+                stderr.seek(0)
+                sys.exit(f"Cold start failed with exit code {returncode}:\n{stderr.read().strip()}")
+            lines.append(line)
+        timings = json.loads(lines[-2])
+        timings.update(memory_kb(int(lines[-1])))
+        proc.communicate('')
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pid', type=int, help="gunicorn master pid to inspect instead of a cold start")
+    args = parser.parse_args()
+
+    if args.pid:
+        report = {"master": memory_kb(args.pid), "workers": {pid: memory_kb(pid) for pid in child_pids(args.pid)}}
+    else:
+        report = cold_start()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import math
+import os
+
+
+# Worker classes the app is safe to run under. gevent is left out on purpose: its monkey-patching
+# happens after gunicorn's preload has imported app.py, so the locks the app already created would
+# block the whole worker instead of one greenlet.
+WORKER_CLASSES = ('gthread', 'sync')
+
+
+def worker_plan(cpu_count, llm_latency=2.0, cpu_time=0.05, worker_class='gthread', workers=None, threads=None,
+                max_threads=64):
+    """
+    Sizes gunicorn for the app's mix of short CPU work and long waits on Gemini.
+
+    Each worker process gets a core (at least two processes, so one crash or restart
+    never takes the site down). With gthread workers, a request spends about
+    `cpu_time` seconds on a core and `llm_latency` seconds waiting on the network, so
+    by Little's law (llm_latency + cpu_time) / cpu_time threads keep that core busy;
+    the count is capped at `max_threads`, past which GIL contention and memory cost
+    more than the extra concurrency buys.
+
+    Args:
+    cpu_count (int): Cores available to the server.
+    llm_latency (float): Expected seconds a request waits on Gemini.
+    cpu_time (float): Expected CPU seconds per request (rendering, model, session I/O).
+    worker_class (str): 'gthread' or 'sync'.
+    workers (int): Fixed process count (WEB_CONCURRENCY), instead of the sizing.
+    threads (int): Fixed threads per process, instead of the sizing.
+    max_threads (int): Upper bound for the sized thread count.
+
+    Returns:
+    dict: worker_class, workers, threads and the concurrent requests they can hold.
+
+    Raises:
+    ValueError: For a worker class the app does not support.
+    """
+    if worker_class not in WORKER_CLASSES:
+        raise ValueError(f"Unsupported worker class {worker_class!r}; use one of {', '.join(WORKER_CLASSES)}")
+    workers = workers or max(2, cpu_count)
+    if worker_class == 'sync':
+        threads = 1
+    elif not threads:
+        threads = min(max_threads, max(4, math.ceil((llm_latency + cpu_time) / cpu_time)))
+    return {"worker_class": worker_class, "workers": workers, "threads": threads, "capacity": workers * threads}
+
+
+def worker_plan_from_env():
+    """
+    Builds the plan from GUNICORN_WORKER_CLASS, WEB_CONCURRENCY, GUNICORN_THREADS,
+    GUNICORN_MAX_THREADS, EXPECTED_LLM_LATENCY and REQUEST_CPU_TIME (see worker_plan).
+    """
+    return worker_plan(
+        cpu_count=len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1,
+        llm_latency=float(os.getenv('EXPECTED_LLM_LATENCY', 2.0)),
+        cpu_time=float(os.getenv('REQUEST_CPU_TIME', 0.05)),
+        worker_class=os.getenv('GUNICORN_WORKER_CLASS', 'gthread'),
+        workers=int(os.getenv('WEB_CONCURRENCY', 0)) or None,
+        threads=int(os.getenv('GUNICORN_THREADS', 0)) or None,
+        max_threads=int(os.getenv('GUNICORN_MAX_THREADS', 64)),
+    )
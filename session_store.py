@@ -0,0 +1,238 @@
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from metrics import REGISTRY as metrics
+
+
+# Records at least this large are zlib-compressed before they are stored
+COMPRESS_THRESHOLD = 512
+
+# A read refreshes a SQLite session's accessed_at only when it is older than this (seconds),
+# so reads cost at most one small write per session per minute
+ACCESS_RESOLUTION = 60
+
+
+def pack_record(data):
+    """
+    Serializes session data into a compact record: minified JSON, zlib-compressed
+    when large. The first byte marks the encoding ('j' plain JSON, 'z' compressed).
+    """
+    raw = json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    if len(raw) >= COMPRESS_THRESHOLD:
+        return b'z' + zlib.compress(raw, 6)
+    return b'j' + raw
+
+
+def unpack_record(record):
+    """
+    Reverses `pack_record`.
+    """
+    record = bytes(record)
+    raw = zlib.decompress(record[1:]) if record[:1] == b'z' else record[1:]
+    return json.loads(raw.decode('utf-8'))
+
+
+class MemorySessionStore:
+    """
+    In-process session store with LRU and TTL eviction. Suitable for development
+    or a single worker; sessions are not shared between processes.
+    """
+
+    def __init__(self, ttl=24 * 3600, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._records.get(sid)
+            if entry is None:
+                return None
+            expires_at, record = entry
+            if expires_at <= time.time():
+                del self._records[sid]
+                return None
+            self._records.move_to_end(sid)
+        return unpack_record(record)
+
+    def save(self, sid, data):
+        record = pack_record(data)
+        with self._lock:
+            self._records[sid] = (time.time() + self.ttl, record)
+            self._records.move_to_end(sid)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+        return len(record)
+
+    def delete(self, sid):
+        with self._lock:
+            self._records.pop(sid, None)
+
+
+class SQLiteSessionStore:
+    """
+    Session store in a SQLite file, shared by every worker on the machine.
+
+    Expired sessions and the least recently used sessions beyond `max_entries`
+    are pruned periodically. Both reads and writes count as use; reads update
+    `accessed_at` at most every ACCESS_RESOLUTION seconds.
+    """
+
+    def __init__(self, path, ttl=24 * 3600, max_entries=100000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._connect().execute(
+            "CREATE TABLE IF NOT EXISTS sessions (sid TEXT PRIMARY KEY, data BLOB, expires_at REAL, accessed_at REAL)")
+        self._connect().execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # Connections must not cross a fork (e.g. gunicorn preload), so reconnect in a new process
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def load(self, sid):
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT data, accessed_at FROM sessions WHERE sid = ? AND expires_at > ?", (sid, now)).fetchone()
+        if row is None:
+            return None
+        if row[1] < now - ACCESS_RESOLUTION:
+            conn.execute("UPDATE sessions SET accessed_at = ? WHERE sid = ?", (now, sid))
+        return unpack_record(row[0])
+
+    def save(self, sid, data):
+        record = pack_record(data)
+        now = time.time()
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?)",
+                     (sid, sqlite3.Binary(record), now + self.ttl, now))
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % 200 == 1
+        if prune:
+            conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM sessions WHERE sid IN (SELECT sid FROM sessions "
+                         "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+        return len(record)
+
+    def delete(self, sid):
+        self._connect().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """
+    Session whose data lives in a server-side store; the cookie only carries `sid`.
+    """
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """
+    Flask session interface backed by a MemorySessionStore or SQLiteSessionStore.
+
+    Keeps chat history and LLM responses out of the cookie, so requests no longer
+    upload and re-verify kilobytes of signed cookie data and large responses no
+    longer overflow the 4 KB cookie limit.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    @staticmethod
+    def _new_sid():
+        return secrets.token_urlsafe(24)
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.store.load(sid)
+            if data is not None:
+                return ServerSideSession(data, sid=sid)
+        return ServerSideSession(sid=self._new_sid(), new=True)
+
+    def persist(self, session):
+        """
+        Writes the session to the store immediately. Streaming responses use this to save
+        data produced after the response headers (and the cookie) were already sent.
+
+        Returns:
+        int: The size in bytes of the stored record (0 when the session was deleted).
+        """
+        session.modified = False
+        if session:
+            size = self.store.save(session.sid, dict(session))
+            metrics.observe('investiq_session_payload_bytes', size)
+            return size
+        self.store.delete(session.sid)
+        return 0
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.persist(session)
+
+        if session.new or self.should_set_cookie(app, session):
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def session_interface_from_env():
+    """
+    Builds the session interface from environment variables.
+
+    SESSION_STORE selects the backend: 'memory' (default, single process) or 'sqlite'
+    (shared by all workers, at SESSION_DB). SESSION_TTL is the lifetime in seconds after
+    the last change and SESSION_MAX_ENTRIES caps how many sessions are kept.
+    """
+    ttl = float(os.getenv('SESSION_TTL', 24 * 3600))
+    max_entries = int(os.getenv('SESSION_MAX_ENTRIES', 100000))
+    if os.getenv('SESSION_STORE', 'memory') == 'sqlite':
+        store = SQLiteSessionStore(os.getenv('SESSION_DB', 'sessions.sqlite3'), ttl=ttl, max_entries=max_entries)
+    else:
+        store = MemorySessionStore(ttl=ttl, max_entries=max_entries)
+    return ServerSideSessionInterface(store)
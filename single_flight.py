@@ -0,0 +1,136 @@
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: cross-worker coalescing is unavailable
+    fcntl = None
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that compute the same thing.
+
+    Within a process, the first caller for a key (the leader) runs the function and
+    every caller that arrives while it runs waits for and shares its result (or its
+    exception). Nothing is kept once the call finishes; reuse after that is the job
+    of the response caches.
+
+    Across gunicorn workers, calls can additionally be serialized through an advisory
+    file lock per key in `lock_dir`. This only helps when the result lands somewhere
+    the other workers can see it, so it is used for calls given a `recheck` function
+    (e.g. a lookup in the shared SQLite cache) that is tried again once the lock is held.
+    """
+
+    def __init__(self, lock_dir=None, lock_timeout=90.0, poll_interval=0.05):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.counters = {"leaders": 0, "coalesced": 0, "lock_waits": 0, "lock_timeouts": 0, "rechecked": 0}
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    def do(self, key, fn, recheck=None):
+        """
+        Runs `fn()` once for all concurrent callers with the same `key`.
+
+        Args:
+        key (str): Identifies the call, e.g. a normalized prompt hash.
+        fn (callable): Computes the result.
+        recheck (callable): Optional; returns the result if another worker already produced
+            it, or None. Enables the cross-worker file lock.
+
+        Returns:
+        The result of `fn()`, shared with every coalesced caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.counters["leaders"] += 1
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            if self.lock_dir and recheck is not None:
+                call.result = self._run_locked(key, fn, recheck)
+            else:
+                call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def _run_locked(self, key, fn, recheck):
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        with open(os.path.join(self.lock_dir, name + '.lock'), 'a') as lock_file:
+            deadline = time.monotonic() + self.lock_timeout
+            waited = False
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    waited = True
+                    if time.monotonic() >= deadline:
+                        # The other worker is stuck; compute without the lock rather than fail
+                        self._count("lock_timeouts")
+                        return fn()
+                    time.sleep(self.poll_interval)
+
+            try:
+                if waited:
+                    self._count("lock_waits")
+                    # Another worker held the lock, so it has probably just stored the result
+                    result = recheck()
+                    if result is not None:
+                        self._count("rechecked")
+                        return result
+                return fn()
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def stats(self):
+        """
+        Returns the leader/coalesced counters and the number of calls in flight.
+        """
+        with self._lock:
+            return dict(self.counters, in_flight=len(self._calls))
+
+
+def single_flight_from_env():
+    """
+    Builds a SingleFlight. SINGLE_FLIGHT_DIR enables cross-worker coalescing through lock
+    files in that directory (pair it with LLM_CACHE_DB so waiting workers find the result),
+    and SINGLE_FLIGHT_LOCK_TIMEOUT bounds how long a worker waits for another one.
+    """
+    return SingleFlight(
+        lock_dir=os.getenv('SINGLE_FLIGHT_DIR') or None,
+        lock_timeout=float(os.getenv('SINGLE_FLIGHT_LOCK_TIMEOUT', 90)),
+    )
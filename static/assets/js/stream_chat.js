@@ -0,0 +1,78 @@
+/**
+ * Streaming chat helper for the InvestIQ chat pages.
+ *
+ * Posts a message to a chat route with `Accept: text/event-stream` and reads the
+ * server-sent events as they arrive, so the reply renders token by token instead
+ * of after the whole generation.
+ *
+ *   streamChat(url, { body, headers, onText, onDone, onError })
+ *
+ * onText(chunk, fullTextSoFar) runs for every chunk, onDone(fullText) once the
+ * reply is complete and onError(message) on failure.
+ */
+(function() {
+  "use strict";
+
+  const parseEvent = (block) => {
+    let event = "message"
+    let data = ""
+    block.split("\n").forEach(line => {
+      if (line.startsWith("event:")) event = line.slice(6).trim()
+      else if (line.startsWith("data:")) data += line.slice(5).trim()
+    })
+    return { event: event, data: data ? JSON.parse(data) : {} }
+  }
+
+  window.streamChat = async function(url, options) {
+    const onText = options.onText || function() {}
+    const onDone = options.onDone || function() {}
+    const onError = options.onError || function() {}
+    let text = ""
+
+    try {
+      const response = await fetch(url, {
+        method: "POST",
+        headers: Object.assign({ "Accept": "text/event-stream" }, options.headers || {}),
+        body: options.body
+      })
+
+      if (!response.ok || !response.body) {
+        const error = await response.json().catch(() => ({}))
+        onError(error.error || "Something went wrong. Please try again.")
+        return
+      }
+
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+
+      while (true) {
+        const { value, done } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        // Events are separated by a blank line
+        let boundary
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+          const message = parseEvent(buffer.slice(0, boundary))
+          buffer = buffer.slice(boundary + 2)
+
+          if (message.event === "error") {
+            onError(message.data.error || "Something went wrong. Please try again.")
+            return
+          } else if (message.event === "done") {
+            onDone(message.data.response !== undefined ? message.data.response : text)
+            return
+          } else if (message.data.text) {
+            text += message.data.text
+            onText(message.data.text, text)
+          }
+        }
+      }
+      onDone(text)
+    } catch (error) {
+      console.error("Stream error:", error)
+      onError("There was an error processing your request.")
+    }
+  }
+})();
@@ -0,0 +1,183 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+
+from flask import abort, request, send_file
+
+
+# Built copies live under static/dist, so their URLs are /static/dist/<path>
+DIST_DIRNAME = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Fingerprinted files never change, so browsers and CDNs may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Formats that are not already compressed
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map', '.ttf', '.eot', '.otf', '.less',
+                           '.scss', '.ico', '.xml'}
+
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def fingerprint(path, content):
+    """
+    Returns `path` with a content hash before its extension ("css/style.css" -> "css/style.3f2a9c01b7de.css").
+    """
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+
+def rewrite_css_urls(css, css_path, manifest):
+    """
+    Points the url(...) references of a stylesheet at the fingerprinted copies of their targets.
+    """
+    base = posixpath.dirname(css_path)
+
+    def replace(match):
+        quote, target = match.group(1), match.group(2).strip()
+        if target.startswith(('data:', 'http:', 'https:', '//', '#', '/')):
+            return match.group(0)
+        path, cut, suffix = target, '', ''
+        for separator in ('?', '#'):
+            if separator in path:
+                path, rest = path.split(separator, 1)
+                cut, suffix = separator, rest
+                break
+        resolved = posixpath.normpath(posixpath.join(base, path))
+        hashed = manifest.get(resolved)
+        if hashed is None:
+            return match.group(0)
+        relative = posixpath.relpath(hashed, base)
+        return f"url({quote}{relative}{cut}{suffix}{quote})"
+
+    return _CSS_URL.sub(replace, css)
+
+
+def write_compressed(path, content):
+    """
+    Writes .gz (and .br when the brotli package is installed) next to `path`, keeping only
+    the encodings that are actually smaller.
+
+    Returns:
+    dict: The bytes written per encoding.
+    """
+    sizes = {}
+    encoded = {'gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(content, quality=11)
+    for suffix, data in encoded.items():
+        if len(data) < len(content) * 0.95:
+            with open(f"{path}.{suffix}", 'wb') as f:
+                f.write(data)
+            sizes[suffix] = len(data)
+    return sizes
+
+
+def build(static_dir):
+    """
+    Writes fingerprinted (and precompressed) copies of every file under `static_dir` to
+    `static_dir/dist`, plus a manifest mapping each original path to its copy.
+
+    Stylesheets are written last, with their url(...) references rewritten to the
+    fingerprinted fonts and images, so their own hash covers those references.
+
+    Returns:
+    dict: Totals of files and bytes written, original and per encoding.
+    """
+    dist_dir = os.path.join(static_dir, DIST_DIRNAME)
+    shutil.rmtree(dist_dir, ignore_errors=True)
+
+    sources = []
+    for directory, dirnames, filenames in os.walk(static_dir):
+        dirnames[:] = sorted(d for d in dirnames if os.path.join(directory, d) != dist_dir)
+        for filename in sorted(filenames):
+            full_path = os.path.join(directory, filename)
+            sources.append(os.path.relpath(full_path, static_dir).replace(os.sep, '/'))
+    sources.sort(key=lambda path: path.endswith('.css'))
+
+    manifest = {}
+    totals = {"files": 0, "bytes": 0, "gz": 0, "br": 0}
+    for path in sources:
+        with open(os.path.join(static_dir, path), 'rb') as f:
+            content = f.read()
+        if path.endswith('.css'):
+            content = rewrite_css_urls(content.decode('utf-8'), path, manifest).encode('utf-8')
+        hashed = fingerprint(path, content)
+        manifest[path] = hashed
+
+        target = os.path.join(dist_dir, hashed)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(content)
+        totals["files"] += 1
+        totals["bytes"] += len(content)
+        if posixpath.splitext(path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+            for encoding, size in write_compressed(target, content).items():
+                totals[encoding] += size
+
+    with open(os.path.join(dist_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=0, sort_keys=True)
+    return totals
+
+
+class StaticAssets:
+    """
+    Serves the fingerprinted copies written by `build` and makes `url_for('static', ...)`
+    point at them.
+
+    Responses carry an immutable, year-long Cache-Control and a strong ETag (If-None-Match
+    gets a 304), and the precompressed .br or .gz copy is sent when the client accepts it.
+    Without a manifest (nothing built yet, e.g. in development) nothing changes and Flask's
+    own static handler serves the originals.
+    """
+
+    def __init__(self, app):
+        self.dist_dir = os.path.join(app.static_folder, DIST_DIRNAME)
+        self.manifest = {}
+        manifest_path = os.path.join(self.dist_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                self.manifest = json.load(f)
+        if not self.manifest:
+            return
+
+        app.url_defaults(self.hashed_url)
+        app.add_url_rule(f"{app.static_url_path}/{DIST_DIRNAME}/<path:filename>", 'static_dist', self.serve)
+
+    def hashed_url(self, endpoint, values):
+        if endpoint == 'static':
+            hashed = self.manifest.get(values.get('filename'))
+            if hashed is not None:
+                values['filename'] = f"{DIST_DIRNAME}/{hashed}"
+
+    def serve(self, filename):
+        path = os.path.normpath(os.path.join(self.dist_dir, filename))
+        if not path.startswith(self.dist_dir + os.sep) or not os.path.isfile(path):
+            abort(404)
+
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in request.accept_encodings and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        # The file name carries the content hash; the encoding tells the representations apart
+        etag = posixpath.basename(filename) + (f"-{encoding}" if encoding else '')
+        response = send_file(path, mimetype=mimetype, etag=etag, conditional=True, max_age=31536000)
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
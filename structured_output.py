@@ -0,0 +1,253 @@
+import json
+import re
+import threading
+
+
+# Typographic quotes that LLMs sometimes emit in place of JSON quotes
+SMART_QUOTES = str.maketrans({'“': '"', '”': '"', '„': '"', '‘': "'", '’': "'"})
+
+# Characters that open or close a string while scanning; repair_json turns the typographic ones into '"'
+STRING_QUOTES = '"“”„'
+
+# A dangling comma or colon left at the end of a truncated value
+_DANGLING_TAIL = re.compile(r'[,:]\s*$')
+
+# Per-route parse outcome counters, see `parse_stats`
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+class SchemaError(ValueError):
+    """
+    Raised when parsed JSON does not match the expected schema.
+    """
+
+
+def _count(name, outcome):
+    with _counters_lock:
+        counters = _counters.setdefault(name, {"parsed": 0, "repaired": 0, "failed": 0, "invalid": 0})
+        counters[outcome] += 1
+
+
+def parse_stats():
+    """
+    Returns the parse outcome counters per route: cleanly parsed, parsed after repair,
+    failed to parse, and parsed but rejected by the schema.
+    """
+    with _counters_lock:
+        return {name: dict(counters) for name, counters in _counters.items()}
+
+
+def extract_json(text):
+    """
+    Finds the first JSON object or array in `text` in a single pass.
+
+    Markdown fences and any prose around the value are skipped. String literals
+    (including ones in smart quotes, which `repair_json` turns into JSON quotes) and
+    escapes are tracked, so brackets inside strings do not count. If the value is cut
+    off (e.g. the model hit its output limit), the missing closing quote and brackets
+    are appended. Only if that does not parse is the text cut back to the last
+    complete element (the last complete item of a top-level array).
+
+    Returns:
+    tuple: (json_text, repaired) where `repaired` says whether the text was completed,
+    or (None, False) when no JSON value starts in the text.
+    """
+    start = -1
+    stack = []
+    in_string = False
+    escaped = False
+    last_comma = None
+    last_item_end = None
+    for i, ch in enumerate(text):
+        if start < 0:
+            if ch in '{[':
+                start = i
+                stack.append('}' if ch == '{' else ']')
+            continue
+
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch in STRING_QUOTES:
+                in_string = False
+        elif ch in STRING_QUOTES:
+            in_string = True
+        elif ch in '{[':
+            stack.append('}' if ch == '{' else ']')
+        elif ch in '}]':
+            stack.pop()
+            if not stack:
+                return text[start:i + 1], False
+        elif ch == ',':
+            last_comma = (i, len(stack))
+            if stack == [']']:
+                last_item_end = i
+
+    if start < 0:
+        return None, False
+
+    # Truncated: close the open string, drop a dangling comma or colon, close the containers
+    tail = text[start:].rstrip()
+    if in_string:
+        tail += '"'
+    closed = _DANGLING_TAIL.sub('', tail) + ''.join(reversed(stack))
+    if _parses(closed):
+        return closed, True
+    if last_item_end is not None:
+        return text[start:last_item_end] + ']', True
+    if last_comma is not None:
+        end, depth = last_comma
+        closed = text[start:end] + ''.join(reversed(stack[:depth]))
+    return closed, True
+
+
+def _parses(text):
+    try:
+        json.loads(repair_json(text), strict=False)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+
+def remove_trailing_commas(text):
+    """
+    Drops commas directly before a closing bracket, outside of string literals.
+    """
+    out = []
+    in_string = False
+    escaped = False
+    pending_comma = None
+    for ch in text:
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if pending_comma is not None:
+            if ch.isspace():
+                pending_comma += ch
+                continue
+            if ch not in '}]':
+                out.append(pending_comma)
+            else:
+                out.append(pending_comma[1:])
+            pending_comma = None
+
+        if ch == ',':
+            pending_comma = ch
+        else:
+            out.append(ch)
+            if ch == '"':
+                in_string = True
+
+    if pending_comma is not None:
+        out.append(pending_comma[1:])
+    return ''.join(out)
+
+
+def repair_json(text):
+    """
+    Fixes common LLM JSON defects: smart quotes used as JSON quotes and trailing commas.
+    """
+    return remove_trailing_commas(text.translate(SMART_QUOTES))
+
+
+def validate(value, schema, path='$'):
+    """
+    Checks `value` against a small JSON-schema subset: "type" ("object", "array",
+    "string"), "required", "properties" and "items". Array items that fail
+    validation are dropped rather than failing the whole answer; "minItems"
+    applies to the items that remain.
+
+    Returns:
+    The validated value (arrays may have had invalid items removed).
+
+    Raises:
+    SchemaError: If the value does not match.
+    """
+    expected = schema.get("type")
+    if expected == "object":
+        if not isinstance(value, dict):
+            raise SchemaError(f"{path}: expected an object")
+        for key in schema.get("required", ()):
+            if key not in value:
+                raise SchemaError(f"{path}: missing '{key}'")
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value:
+                value[key] = validate(value[key], sub_schema, f"{path}.{key}")
+        return value
+
+    if expected == "array":
+        if isinstance(value, dict) and schema.get("wrap_object"):
+            value = [value]
+        if not isinstance(value, list):
+            raise SchemaError(f"{path}: expected an array")
+        items = value
+        if "items" in schema:
+            items = []
+            for i, item in enumerate(value):
+                try:
+                    items.append(validate(item, schema["items"], f"{path}[{i}]"))
+                except SchemaError:
+                    continue
+        if len(items) < schema.get("minItems", 0):
+            raise SchemaError(f"{path}: expected at least {schema['minItems']} valid item(s)")
+        return items
+
+    if expected == "string":
+        if value is None:
+            return ""
+        if not isinstance(value, str):
+            return str(value)
+        return value
+
+    return value
+
+
+def parse_llm_json(text, schema, name):
+    """
+    Extracts, repairs and validates the JSON answer in an LLM reply.
+
+    Args:
+    text (str): The raw model output (may contain fences or prose around the JSON).
+    schema (dict): The expected shape, see `validate`.
+    name (str): Route name for the parse counters.
+
+    Returns:
+    The parsed value, or None when no valid value could be recovered.
+    """
+    candidate, repaired = extract_json(text or "")
+    if candidate is None:
+        print(f"[{name} JSON Parsing Error]: no JSON value in response")
+        _count(name, "failed")
+        return None
+
+    try:
+        value = json.loads(candidate, strict=False)
+    except json.JSONDecodeError:
+        try:
+            value = json.loads(repair_json(candidate), strict=False)
+            repaired = True
+        except json.JSONDecodeError as e:
+            print(f"[{name} JSON Parsing Error]: {e}")
+            print("Text That Failed Parsing:", candidate)
+            _count(name, "failed")
+            return None
+
+    try:
+        value = validate(value, schema)
+    except SchemaError as e:
+        print(f"[{name} JSON Schema Error]: {e}")
+        _count(name, "invalid")
+        return None
+
+    _count(name, "repaired" if repaired else "parsed")
+    return value
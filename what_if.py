@@ -0,0 +1,203 @@
+import numpy as np
+
+from loan_data import LOAN_STATUS_CODES, columns
+
+
+ASSET_COLUMNS = ['residential_assets_value', 'commercial_assets_value', 'luxury_assets_value', 'bank_asset_value']
+
+# What an applicant could change. 'absolute' sweeps set the column to each grid value
+# (the applicant's own value is always included); 'factor' sweeps multiply the columns by
+# each grid value, 1.0 meaning unchanged. `step` is the resolution used to refine a
+# suggestion and `span` turns a change into a cost comparable across sweeps.
+SWEEPS = {
+    'cibil_score': {'columns': ['cibil_score'], 'kind': 'absolute', 'grid': np.arange(300, 901, 50),
+                    'step': 5, 'span': 600.0},
+    'loan_amount': {'columns': ['loan_amount'], 'kind': 'factor', 'grid': np.round(np.arange(1.0, 0.25, -0.1), 2),
+                    'step': 0.02, 'span': 1.0},
+    'loan_term': {'columns': ['loan_term'], 'kind': 'absolute', 'grid': np.arange(2, 21, 2),
+                  'step': 1, 'span': 18.0},
+    'assets': {'columns': ASSET_COLUMNS, 'kind': 'factor', 'grid': np.array([1.0, 1.5, 2.0]),
+               'step': 0.05, 'span': 1.0},
+}
+
+APPROVED = LOAN_STATUS_CODES['approved']
+
+
+def baseline(name, row):
+    """
+    The unchanged setting of a sweep for the applicant `row`.
+    """
+    spec = SWEEPS[name]
+    return row[columns.index(spec['columns'][0])] if spec['kind'] == 'absolute' else 1.0
+
+
+def grid_values(name, row):
+    spec = SWEEPS[name]
+    if spec['kind'] == 'absolute':
+        return np.union1d(spec['grid'], [baseline(name, row)]).astype(np.float64)
+    if not any(row[columns.index(c)] for c in spec['columns']):
+        # Scaling zero changes nothing
+        return np.array([1.0])
+    return spec['grid'].astype(np.float64)
+
+
+def apply_settings(row, names, settings):
+    """
+    Builds one model row per setting.
+
+    Args:
+    row (np.ndarray): The applicant's encoded row, shape (len(columns),).
+    names (list): The sweeps, one per column of `settings`.
+    settings (np.ndarray): A (n, len(names)) array of sweep values.
+
+    Returns:
+    np.ndarray: A (n, len(columns)) array of rows to score.
+    """
+    rows = np.repeat(row[np.newaxis, :], len(settings), axis=0)
+    for j, name in enumerate(names):
+        spec = SWEEPS[name]
+        for col in spec['columns']:
+            i = columns.index(col)
+            if spec['kind'] == 'absolute':
+                rows[:, i] = settings[:, j]
+            else:
+                # Unrounded, so a factor of 1.0 scores the applicant's own value and the amounts
+                # reported are exactly the ones that were scored
+                rows[:, i] = row[i] * settings[:, j]
+    return rows
+
+
+def normalized_changes(row, names, settings):
+    """
+    Signed change of every setting from the applicant's own values, scaled by each sweep's span.
+    """
+    base = np.array([baseline(name, row) for name in names])
+    span = np.array([SWEEPS[name]['span'] for name in names])
+    return (settings - base) / span
+
+
+def score(model, rows):
+    """
+    Returns (approved, approval probability) for every row, in one batched model call.
+    """
+    proba = model.predict_proba(rows)
+    approved = model.classes_.take(proba.argmax(axis=1)) == APPROVED
+    return approved, proba[:, int(np.flatnonzero(model.classes_ == APPROVED)[0])]
+
+
+def minimal_changes(changes, approved, limit):
+    """
+    Picks the approved grid points that change the fewest things, and the least.
+
+    Points are ranked by the number of sweeps changed, then the total normalized change.
+    A point is skipped when an earlier pick already asks for the same or smaller changes
+    in the same directions (e.g. CIBIL 700 once CIBIL 650 alone is enough).
+
+    Returns:
+    list: Indexes into `changes`.
+    """
+    candidates = np.flatnonzero(approved)
+    magnitude = np.abs(changes[candidates])
+    remaining = candidates[np.lexsort((magnitude.sum(axis=1), (magnitude > 0).sum(axis=1)))]
+    chosen = []
+    while remaining.size and len(chosen) < limit:
+        best = changes[remaining[0]]
+        chosen.append(int(remaining[0]))
+        others = changes[remaining]
+        dominated = np.all((best == 0) | ((np.sign(others) == np.sign(best)) & (np.abs(others) >= np.abs(best))),
+                           axis=1)
+        remaining = remaining[~dominated]
+    return chosen
+
+
+def refine(model, row, names, settings):
+    """
+    Moves every changed setting of each suggestion as close to the applicant's own value as
+    the model allows, at each sweep's `step`.
+
+    Each sweep is refined with the others held at the suggestion, and the combined result
+    is checked again; a suggestion whose refinement no longer gets approved is kept as is.
+    """
+    trials, owners = [], []
+    for k, setting in enumerate(settings):
+        for j, name in enumerate(names):
+            base = baseline(name, row)
+            if setting[j] == base:
+                continue
+            step = SWEEPS[name]['step'] * np.sign(setting[j] - base)
+            values = np.arange(base + step, setting[j], step)
+            trial = np.repeat(setting[np.newaxis, :], len(values), axis=0)
+            trial[:, j] = values
+            trials.append(trial)
+            owners.extend((k, j, v) for v in values)
+    if not trials:
+        return settings
+
+    approved, _ = score(model, apply_settings(row, names, np.vstack(trials)))
+    refined = settings.copy()
+    for (k, j, value), ok in zip(owners, approved):
+        base = baseline(names[j], row)
+        if ok and abs(value - base) < abs(refined[k, j] - base):
+            refined[k, j] = value
+
+    approved, _ = score(model, apply_settings(row, names, refined))
+    return np.where(approved[:, np.newaxis], refined, settings)
+
+
+def what_if(model, row, sweeps=None, limit=5):
+    """
+    Finds the smallest changes to a rejected application that the model would approve.
+
+    Every combination of the sweep grids (a few thousand rows) is scored in one batched
+    model call. The best points are then refined to a finer resolution.
+
+    Args:
+    model: A fitted classifier with `predict_proba` and `classes_` (e.g. CompiledForest).
+    row (np.ndarray): The applicant's encoded row (see loan_data.encode_applicant).
+    sweeps (list): Names from SWEEPS to vary; all of them by default.
+    limit (int): Maximum number of suggestions.
+
+    Returns:
+    dict: The current decision and approval probability, the number of grid points scored
+    and the suggestions, each with its changed fields ({"from", "to"} per column) and
+    approval probability.
+
+    Raises:
+    ValueError: If a sweep name is unknown.
+    """
+    names = list(sweeps or SWEEPS)
+    unknown = [name for name in names if name not in SWEEPS]
+    if unknown:
+        raise ValueError(f"Unknown sweep: {', '.join(unknown)}")
+
+    row = np.asarray(row, dtype=np.float64).ravel()
+    approved, probability = score(model, row[np.newaxis, :])
+    result = {"approved": bool(approved[0]), "approval_probability": round(float(probability[0]), 4),
+              "grid_points": 0, "suggestions": []}
+    if approved[0]:
+        return result
+
+    mesh = np.meshgrid(*(grid_values(name, row) for name in names), indexing='ij')
+    settings = np.column_stack([m.ravel() for m in mesh])
+    approved, _ = score(model, apply_settings(row, names, settings))
+    result["grid_points"] = len(settings)
+
+    chosen = minimal_changes(normalized_changes(row, names, settings), approved, limit)
+    if not chosen:
+        return result
+
+    settings = refine(model, row, names, settings[chosen])
+    changes = np.abs(normalized_changes(row, names, settings))
+    order = np.lexsort((changes.sum(axis=1), (changes > 0).sum(axis=1)))
+    rows = apply_settings(row, names, settings[order])
+    _, probability = score(model, rows)
+
+    seen = set()
+    for new_row, p in zip(rows, probability):
+        changed = {col: {"from": float(row[i]), "to": float(new_row[i])}
+                   for i, col in enumerate(columns) if new_row[i] != row[i]}
+        key = tuple(sorted((col, change["to"]) for col, change in changed.items()))
+        if key not in seen:
+            seen.add(key)
+            result["suggestions"].append({"changes": changed, "approval_probability": round(float(p), 4)})
+    return result